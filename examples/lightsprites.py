@@ -0,0 +1,102 @@
+# pygsear
+# Copyright (C) 2003 Lee Harr
+#
+#
+# This file is part of pygsear.
+#
+# pygsear is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pygsear is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pygsear; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+
+"""Compare the speed and size of Drawable and LightSprite.
+
+Runs without opening a window. Usage:
+
+    python lightsprites.py [number_of_sprites] [frames]
+
+"""
+
+import sys
+import time
+
+import pygame
+
+from pygsear import Drawable, Path, Screen, conf
+
+
+def make_drawables(n, image):
+    sprites = []
+    for i in range(n):
+        sprite = Drawable.Image(image=image)
+        sprite.set_path(Path.PathNG(startLocation=(i % 800, i % 600), vx=20, vy=10))
+        sprites.append(sprite)
+    return sprites
+
+def make_light(n, image):
+    sprites = []
+    for i in range(n):
+        path = Path.LightPath(startLocation=(i % 800, i % 600), vx=20, vy=10)
+        sprites.append(Drawable.LightSprite(image=image, path=path))
+    return sprites
+
+def size_of(sprite):
+    """return bytes used by a sprite and its path, not counting
+    the rects, images and lists they share with other objects.
+
+    """
+
+    if not hasattr(sys, 'getsizeof'):
+        return None
+    size = sys.getsizeof(sprite) + sys.getsizeof(sprite.path)
+    for thing in (sprite, sprite.path):
+        if hasattr(thing, '__dict__'):
+            size += sys.getsizeof(thing.__dict__)
+    return size
+
+def run(make, n, frames, image):
+    t0 = time.time()
+    sprites = make(n, image)
+    group = Drawable.SpriteGroup()
+    for sprite in sprites:
+        group.add(sprite)
+    t1 = time.time()
+    for frame in range(frames):
+        group.clear()
+        group.move()
+        group.draw()
+    t2 = time.time()
+    return t1 - t0, (t2 - t1) / frames, size_of(sprites[0])
+
+def main():
+    n = 5000
+    frames = 50
+    if len(sys.argv) > 1:
+        n = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        frames = int(sys.argv[2])
+
+    Screen.Offscreen()
+    conf.ticks = 20
+    image = pygame.Surface((4, 4))
+    image.fill((255, 255, 255))
+
+    print '%d sprites, %d frames' % (n, frames)
+    print '%-12s %10s %12s %10s' % ('', 'make (s)', 'frame (ms)', 'bytes')
+    for name, make in (('Drawable', make_drawables), ('LightSprite', make_light)):
+        made, frame, size = run(make, n, frames, image)
+        print '%-12s %10.3f %12.2f %10s' % (name, made, frame * 1000, size)
+
+
+if __name__ == '__main__':
+    main()
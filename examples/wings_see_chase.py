@@ -22,7 +22,7 @@ import random
 
 import pygame
 
-from pygsear import Game, Drawable, Path, conf
+from pygsear import Game, Drawable, Path, Sight, conf
 from pygsear.locals import *
 
 class Wing(Drawable.RotatedImage):
@@ -82,10 +82,11 @@ class AGame(Game.Game):
         Game.SpriteGroup.draw = Game.SpriteGroup.draw_visible
 
     def makeBlocks(self):
-        self.blocks = []
+        rects = []
         for b in range(5):
             block = Block()
-            self.blocks.append(block.crect)
+            rects.append(block.crect)
+        self.blocks = Sight.LineOfSight(rects)
 
     def makeWings(self):
         self.enemies = self.addGroup()
@@ -112,11 +113,10 @@ class AGame(Game.Game):
                 self.makeWings()
             self.chooseEnemy()
 
-        for enemy in self.enemies.sprites():
-            if not self.ship.can_see(enemy, self.blocks):
-                enemy.hidden = 1
-            else:
-                enemy.hidden = 0
+        enemies = self.enemies.sprites()
+        seen = self.ship.can_see_list(enemies, self.blocks)
+        for n in range(len(enemies)):
+            enemies[n].hidden = not seen[n]
 
 
 if __name__ == '__main__':
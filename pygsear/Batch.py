@@ -0,0 +1,213 @@
+# pygsear
+# Copyright (C) 2003 Lee Harr
+#
+#
+# This file is part of pygsear.
+#
+# pygsear is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pygsear is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pygsear; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Render many drawing scripts to image files.
+
+Each script is run with an L{Screen.Offscreen} as the default layer,
+so it draws without a window, and whatever it drew is saved as an
+image file. Scripts are run in separate processes, as many at once
+as there are processors, so one script crashing or hanging does not
+stop the others.
+
+From the command line::
+
+    python Batch.py [-j processes] [-o outdir] [-s WxH] [-t WxH]
+                    [-T seconds] script.py ...
+
+"""
+
+import sys
+import os
+import time
+import signal
+import getopt
+
+try:
+    import multiprocessing
+except ImportError:
+    # python before 2.6
+    multiprocessing = None
+
+import conf
+import Screen
+from Util import save_image
+
+
+def render(script, output, size=None, thumbnail=None):
+    """Run script in this process, and save what it drew.
+
+    @param script: Name of python file to run. It is run as
+        C{__main__}, and it may call C{sys.exit} when done.
+    @param output: Name of image file to save.
+    @param size: C{(width, height)} of the drawing surface,
+        or None to use C{conf.WINSIZE}.
+    @param thumbnail: C{(width, height)} to scale the saved
+        image to, or None to save at full size.
+
+    """
+
+    if size is not None:
+        w, h = size
+        conf.WINWIDTH = w
+        conf.WINHEIGHT = h
+        conf.WINSIZE = [w, h]
+    Screen.Offscreen(conf.WINSIZE)
+
+    namespace = {'__name__': '__main__', '__file__': script}
+    try:
+        execfile(script, namespace)
+    except SystemExit:
+        pass
+
+    # the script may have made its own window or layer
+    save_image(conf.window.screen, output, thumbnail)
+
+
+def run(jobs, processes=None, size=None, thumbnail=None, timeout=None):
+    """Render a list of scripts.
+
+    @param jobs: Sequence of scripts to run. Each can be the name of
+        the script, in which case the image will be saved next to it
+        with a C{.png} extension, or a C{(script, output)} pair.
+    @param processes: Number of scripts to run at once, or None to
+        use one per processor.
+    @param size: C{(width, height)} of the drawing surface.
+    @param thumbnail: C{(width, height)} to scale the saved images to.
+    @param timeout: Seconds to let each script run before giving up
+        on it, or None to wait as long as it takes.
+
+    @return: List of C{(script, output, reason)} for each job which
+        failed.
+
+    """
+
+    pending = []
+    for job in jobs:
+        if type(job) is type(''):
+            job = (job, os.path.splitext(job)[0] + '.png')
+        pending.append(job)
+
+    if multiprocessing is None:
+        return _run_serial(pending, size, thumbnail)
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    pending.reverse()
+    running = []
+    failed = []
+    while pending or running:
+        while pending and len(running) < processes:
+            script, output = pending.pop()
+            process = multiprocessing.Process(target=render,
+                                args=(script, output, size, thumbnail))
+            process.start()
+            running.append((process, script, output, time.time()))
+
+        still_running = []
+        for job in running:
+            process, script, output, started = job
+            if process.is_alive():
+                if timeout is not None and time.time() - started > timeout:
+                    process.terminate()
+                    process.join(1)
+                    if process.is_alive():
+                        # SDL catches SIGTERM
+                        os.kill(process.pid, signal.SIGKILL)
+                        process.join()
+                    failed.append((script, output, 'timed out'))
+                else:
+                    still_running.append(job)
+            else:
+                process.join()
+                if process.exitcode:
+                    reason = 'exit code %s' % process.exitcode
+                    failed.append((script, output, reason))
+
+        if len(still_running) == len(running):
+            # nothing finished
+            time.sleep(0.01)
+        running = still_running
+
+    return failed
+
+
+def _run_serial(jobs, size, thumbnail):
+    """Render each job in this process, one after the other.
+
+    Without multiprocessing, an exception in a script is caught, but a
+    script which crashes or never finishes will stop the whole batch.
+
+    """
+
+    failed = []
+    for script, output in jobs:
+        try:
+            render(script, output, size, thumbnail)
+        except KeyboardInterrupt:
+            raise
+        except:
+            failed.append((script, output, str(sys.exc_info()[1])))
+    return failed
+
+
+def _size(arg):
+    """return C{(width, height)} from a string like C{'640x480'}."""
+
+    w, h = arg.lower().split('x')
+    return (int(w), int(h))
+
+
+if __name__ == '__main__':
+    # run the package modules, which are the ones the scripts will import
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from pygsear import Batch
+
+    opts, scripts = getopt.getopt(sys.argv[1:], 'j:o:s:t:T:')
+    processes = None
+    outdir = None
+    size = None
+    thumbnail = None
+    timeout = None
+    for opt, arg in opts:
+        if opt == '-j':
+            processes = int(arg)
+        elif opt == '-o':
+            outdir = arg
+        elif opt == '-s':
+            size = _size(arg)
+        elif opt == '-t':
+            thumbnail = _size(arg)
+        elif opt == '-T':
+            timeout = float(arg)
+
+    jobs = []
+    for script in scripts:
+        if outdir is not None:
+            name = os.path.splitext(os.path.basename(script))[0] + '.png'
+            jobs.append((script, os.path.join(outdir, name)))
+        else:
+            jobs.append(script)
+
+    failed = Batch.run(jobs, processes, size, thumbnail, timeout)
+    for script, output, reason in failed:
+        print '%s: %s' % (script, reason)
+    if failed:
+        sys.exit(1)
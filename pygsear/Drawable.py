@@ -32,7 +32,11 @@ import conf
 import Screen
 import Path
 import Util
+import Record
+import Timing
+import Sight
 from Util import load_image, load_images, line_seg_intersect, scale_image
+from Util import rect_separation, rect_sweep
 from locals import WHITE, BLACK, TRANSPARENT, LRED
 from locals import PI, PIx2
 
@@ -78,6 +82,14 @@ class SpriteGroup(RenderUpdates):
         RenderUpdates.__init__(self, sprites)
         #self.add(sprites) # should not be necessary... done in Group.__init__
 
+        self.cameras = []
+        self.set_culling(0)
+        self.set_sleep(None)
+        self.culled = 0
+        self.slept = 0
+        self._sleep_frame = 0
+        self._sleep_ticks = {}
+
     def add(self, sprites, level=0):
         """Add sprite to group.
 
@@ -90,7 +102,12 @@ class SpriteGroup(RenderUpdates):
         """
 
         if level == 0:
-            RenderUpdates.add(self, sprites)
+            if isinstance(sprites, LightSprite):
+                if not self.spritedict.has_key(sprites):
+                    self.add_internal(sprites)
+                    sprites.add_internal(self)
+            else:
+                RenderUpdates.add(self, sprites)
         else:
             if not self.levels.has_key(level):
                 level_group = SpriteGroup(self.layer)
@@ -113,6 +130,11 @@ class SpriteGroup(RenderUpdates):
 
         """
 
+        if self.cameras:
+            for camera in self.cameras:
+                camera.clear(self)
+            return
+
         levels = self.levels.keys()
         levels.sort()
         for l in levels:
@@ -134,6 +156,78 @@ class SpriteGroup(RenderUpdates):
                     RenderUpdates.clear(level, self.screen, self.bg)
 
 
+    def set_culling(self, cull=1, margin=0):
+        """Skip drawing sprites which are outside of the visible area.
+
+        The number of sprites skipped in the last C{draw()} is kept
+        in the C{.culled} attribute.
+
+        @param cull: If True, turn culling on, otherwise turn it off.
+        @param margin: Sprites this many pixels outside of the visible
+            area are still drawn.
+
+        """
+
+        self.cull = cull
+        self.cull_margin = margin
+
+    def set_sleep(self, margin=150, rate=4):
+        """Move sprites far outside of the visible area less often.
+
+        Sprites more than C{margin} pixels outside of the visible area
+        only C{move()} once every C{rate} frames. The ticks for the
+        frames they miss are saved up and handed to them on the frame
+        when they do move, so they still keep up with the rest.
+
+        The number of sprites skipped in the last C{move()} is kept
+        in the C{.slept} attribute.
+
+        @param margin: Distance outside of the visible area at which
+            sprites start to sleep, or None to never sleep.
+        @param rate: Sleeping sprites move once every this many frames.
+
+        """
+
+        self.sleep_margin = margin
+        self.sleep_rate = max(1, int(rate))
+
+    def add_camera(self, camera):
+        """Draw the group through a camera.
+
+        Once a group has a camera, the positions of its sprites are
+        world coordinates and C{draw()} shows the part of the world
+        the camera is looking at. Add more than one camera for
+        split-screen views of the same sprites.
+
+        @param camera: L{Screen.Camera}
+
+        """
+
+        if camera not in self.cameras:
+            self.cameras.append(camera)
+
+    def remove_camera(self, camera):
+        """Stop drawing the group through camera."""
+
+        camera.clear(self)
+        self.cameras.remove(camera)
+
+    def get_view(self):
+        """return the L{pygame.Rect} of the visible area.
+
+        If the group has cameras, this is the area of the world
+        seen by any of them.
+
+        """
+
+        if not self.cameras:
+            return self.screen.get_clip()
+
+        view = self.cameras[0].get_world_rect()
+        for camera in self.cameras[1:]:
+            view = view.union(camera.get_world_rect())
+        return view
+
     def draw(self):
         """draw(surface)
         draw all sprites onto the surface
@@ -145,14 +239,105 @@ class SpriteGroup(RenderUpdates):
         """
 
         r = []
+        if self.cameras:
+            margin = self.cull_margin
+            culled = 0
+            for camera in self.cameras:
+                r += camera.draw(self, margin)
+                culled += self.culled
+            self.culled = culled
+            return r
+
         levels = self.levels.keys()
         levels.sort()
+
+        if not self.cull and not Timing.enabled:
+            for l in levels:
+                level = self.levels[l]
+                r += RenderUpdates.draw(level, self.screen)
+            return r
+
+        if self.cull:
+            margin = self.cull_margin
+            view = self.get_view().inflate(2*margin, 2*margin)
+        else:
+            view = None
+        culled = 0
         for l in levels:
             level = self.levels[l]
-            r += RenderUpdates.draw(level, self.screen)
+            if Timing.enabled:
+                dirty, c = self._draw_timed(level, view)
+            else:
+                dirty, c = self._draw_culled(level, view)
+            r += dirty
+            culled += c
+        self.culled = culled
 
         return r
 
+    def _draw_culled(self, level, view):
+        """Draw only the sprites in level which touch view.
+
+        @return: list of dirty rects, and the number of sprites culled.
+
+        """
+
+        surface_blit = self.screen.blit
+        spritedict = level.spritedict
+        dirty = level.lostsprites
+        level.lostsprites = []
+        dirty_append = dirty.append
+        culled = 0
+        for s, r in spritedict.items():
+            if view.colliderect(s.rect):
+                newrect = surface_blit(s.image, s.rect)
+                if r:
+                    dirty_append(newrect.union(r))
+                else:
+                    dirty_append(newrect)
+                spritedict[s] = newrect
+            else:
+                culled += 1
+                if r:
+                    # erase where it was last drawn
+                    dirty_append(r)
+                    spritedict[s] = 0
+        return dirty, culled
+
+    def _draw_timed(self, level, view=None):
+        """Draw the sprites in level, timing each one (see L{Timing}).
+
+        @param view: If not None, only draw sprites which touch view.
+
+        @return: list of dirty rects, and the number of sprites culled.
+
+        """
+
+        surface_blit = self.screen.blit
+        spritedict = level.spritedict
+        dirty = level.lostsprites
+        level.lostsprites = []
+        dirty_append = dirty.append
+        culled = 0
+        timer = Timing.timer
+        record = Timing.record
+        for s, r in spritedict.items():
+            if view is None or view.colliderect(s.rect):
+                start = timer()
+                newrect = surface_blit(s.image, s.rect)
+                record(s.__class__.__name__ + '.draw', timer() - start)
+                if r:
+                    dirty_append(newrect.union(r))
+                else:
+                    dirty_append(newrect)
+                spritedict[s] = newrect
+            else:
+                culled += 1
+                if r:
+                    dirty_append(r)
+                    spritedict[s] = 0
+        return dirty, culled
+
     def draw_visible(self, surface=None):
         """Draw sprites which are not marked hidden
 
@@ -182,9 +367,175 @@ class SpriteGroup(RenderUpdates):
 
     def move(self):
         levels = self.levels.keys()
-        for l in levels:
-            for sprite in self.levels[l].sprites():
-                sprite.move()
+        timed = Timing.enabled
+        if self.sleep_margin is None:
+            for l in levels:
+                for sprite in self.levels[l].sprites():
+                    if timed:
+                        Timing.call(sprite, 'move')
+                    else:
+                        sprite.move()
+            return
+
+        margin = self.sleep_margin
+        view = self.get_view().inflate(2*margin, 2*margin)
+        rate = self.sleep_rate
+        self._sleep_frame += 1
+        frame = self._sleep_frame
+
+        ticks = conf.ticks
+        max_tick = conf.MAX_TICK
+        saved_ticks = self._sleep_ticks
+        sleep_ticks = {}
+        slept = 0
+        n = 0
+        try:
+            for l in levels:
+                for sprite in self.levels[l].sprites():
+                    n += 1
+                    t = saved_ticks.get(sprite, 0) + ticks
+                    if view.colliderect(sprite.rect):
+                        awake = 1
+                    else:
+                        # spread the sleepers out over the frames
+                        awake = not (frame + n) % rate
+
+                    if not awake:
+                        sleep_ticks[sprite] = t
+                        slept += 1
+                        continue
+                    if t != ticks:
+                        # catch up on the ticks missed while sleeping
+                        conf.ticks = t
+                        conf.MAX_TICK = max_tick * rate
+                    if timed:
+                        Timing.call(sprite, 'move')
+                    else:
+                        sprite.move()
+                    conf.ticks = ticks
+                    conf.MAX_TICK = max_tick
+        finally:
+            conf.ticks = ticks
+            conf.MAX_TICK = max_tick
+
+        self._sleep_ticks = sleep_ticks
+        self.slept = slept
+
+    def is_animated(self):
+        """return True if any sprite in the group moved in the last move().
+
+        Loops which only need to redraw when something changes can
+        use this to decide whether to wait for events (see
+        L{Event.EventGroup.wait}) or keep running frames.
+
+        """
+
+        for level in self.levels.values():
+            for sprite in level.sprites():
+                path = sprite.path
+                if path.position != path.positionOld:
+                    return 1
+        return 0
+
+    def collide(self, sprite):
+        """return list of sprites in this group which collide with sprite.
+
+        Sprites at all levels are checked. The C{crect}s are checked
+        first, and then the masks of any sprites which use
+        L{Drawable.set_mask_collide}.
+
+        @param sprite: Sprite to check. If it is in the group, it is
+            not counted as colliding with itself.
+
+        """
+
+        hits = []
+        for level in self.levels.values():
+            for other in sprite.collidelistall(level.sprites()):
+                if other is not sprite:
+                    hits.append(other)
+        return hits
+
+    def collide_swept(self, sprite):
+        """Find the first sprite in this group which sprite hit during
+        its last move().
+
+        See L{Drawable.collidelist_swept}.
+
+        @return: C{(other, t, normal)} or None.
+
+        """
+
+        others = []
+        for level in self.levels.values():
+            others.extend(level.sprites())
+        return sprite.collidelist_swept(others)
+
+    def collide_group(self, group):
+        """return list of C{(sprite, other)} pairs of colliding sprites.
+
+        C{sprite} is from this group, and C{other} is from group. If
+        group is this group, each pair is only listed once.
+
+        """
+
+        others = []
+        for level in group.levels.values():
+            others.extend(level.sprites())
+        if group is self:
+            sprites = others
+        else:
+            sprites = []
+            for level in self.levels.values():
+                sprites.extend(level.sprites())
+        rects = [other.crect for other in others]
+
+        pairs = []
+        for i in range(len(sprites)):
+            sprite = sprites[i]
+            masked = sprite.mask_collide
+            for index in sprite.crect.collidelistall(rects):
+                if group is self and index <= i:
+                    continue
+                other = others[index]
+                if masked or other.mask_collide:
+                    if not sprite.collide_mask(other):
+                        continue
+                pairs.append((sprite, other))
+        return pairs
+
+    def separate(self, obstacles=None, move_both=1):
+        """Move apart all of the overlapping sprites in the group.
+
+        @param obstacles: List of sprites or L{pygame.Rect}s which do
+            not move, or None. Every sprite in the group is moved
+            off of any of these which it overlaps.
+        @param move_both: If True, overlapping sprites in the group
+            are each moved half of the way apart. Otherwise, sprites
+            in the group are only moved off of the obstacles.
+
+        @return: Number of sprites which were moved.
+
+        """
+
+        moved = {}
+        if move_both:
+            for sprite, other in self.collide_group(self):
+                dx, dy = rect_separation(sprite.crect, other.crect)
+                if dx or dy:
+                    odx, ody = dx / 2, dy / 2
+                    sprite._move_by(dx - odx, dy - ody)
+                    other._move_by(-odx, -ody)
+                    moved[sprite] = 1
+                    moved[other] = 1
+
+        if obstacles is not None:
+            for level in self.levels.values():
+                for sprite in level.sprites():
+                    if sprite.separate(obstacles) != (0, 0):
+                        moved[sprite] = 1
+
+        return len(moved)
 
     def pop(self):
         sprite = self.sprites()[0]
@@ -497,6 +848,10 @@ class PSprite(Sprite):
 class Drawable(Sprite):
     """Things to draw on screen."""
 
+    mask_collide = 0
+    pool = None
+    crect = None
+
     def __init__(self, w=None):
         """Initialize Drawable sprite.
 
@@ -528,6 +883,36 @@ class Drawable(Sprite):
 
         self.hidden = 0
 
+    def reinit(self, position=None):
+        """Get a used sprite ready to go again.
+
+        Called by L{Pool.get} instead of making a new sprite. Subclasses
+        which are pooled should override this to reset anything else
+        their C{__init__} sets up, and take whatever arguments they need.
+
+        @param position: Where to put the sprite. If None, the sprite
+            goes back to the start of its path.
+
+        """
+
+        self.hidden = 0
+        self.path.reset()
+        if position is not None:
+            self.set_position(position)
+        else:
+            self._set_position(self.path.get_position())
+
+    def kill(self):
+        """Remove sprite from all groups.
+
+        If the sprite came from a L{Pool}, it goes back in the pool.
+
+        """
+
+        Sprite.kill(self)
+        if self.pool is not None:
+            self.pool.release(self)
+
     def draw(self, surface=None):
         """Blit image to layer
 
@@ -817,6 +1202,8 @@ class Drawable(Sprite):
 
             - param layer: Use this layer instead of the sprite's
                 screen layer.
+            - param camera: Check against the part of the world seen
+                by this L{Screen.Camera} instead.
 
         @param slack: Distance sprite can be off screen and still
             return True. Use a negative number to restrict the sprite
@@ -824,7 +1211,12 @@ class Drawable(Sprite):
 
         """
 
-        if not kw.has_key('layer'):
+        ox, oy = 0, 0
+        if kw.has_key('camera'):
+            layerrect = kw['camera'].get_world_rect()
+            ox, oy = layerrect.topleft
+            del(kw['camera'])
+        elif not kw.has_key('layer'):
             layerrect = self.window.rect
         else:
             layerrect = kw['layer'].rect
@@ -868,25 +1260,25 @@ class Drawable(Sprite):
 
         off = 0
         if left is not None:
-            minX = -left
+            minX = ox - left
             if x < minX:
                 x = minX
                 off = 1
 
         if right is not None:
-            maxX = sx - w + right
+            maxX = ox + sx - w + right
             if x > maxX:
                 x = maxX
                 off = 1
 
         if top is not None:
-            minY = -top
+            minY = oy - top
             if y < minY:
                 y = minY
                 off = 1
 
         if bottom is not None:
-            maxY = sy - h + bottom
+            maxY = oy + sy - h + bottom
             if y > maxY:
                 y = maxY
                 off = 1
@@ -910,40 +1302,146 @@ class Drawable(Sprite):
             if move_both:
                 other._set_position(other.path.positionOld)
 
-        sx, sy = self.crect.center
-        ox, oy = other.crect.center
+        if self.collide(other):
+            dx, dy = rect_separation(self.crect, other.crect)
+            if move_both:
+                # each moves half of the way
+                odx, ody = dx / 2, dy / 2
+                self._move_by(dx - odx, dy - ody)
+                other._move_by(-odx, -ody)
+            else:
+                self._move_by(dx, dy)
 
-        #print 'before', sx, sy, scx, scy, ox, oy, ocx, ocy
-        while self.collide(other):
-            if sx < ox:
-                sx -= 1
-            elif sx > ox:
-                sx += 1
+    def separate(self, obstacles, passes=4):
+        """Move sprite off of any obstacles it overlaps.
 
-            if sy < oy:
-                sy -= 1
-            elif sy > oy:
-                sy += 1
+        Each overlap is fixed by the shortest move that takes the
+        C{crect} off of the obstacle. The obstacles do not move. Moving
+        off of one obstacle may push the sprite on to another, so the
+        obstacles are checked again, up to C{passes} times.
 
-            if move_both:
-                if sx < ox:
-                    ox += 1
-                elif sx > ox:
-                    ox -= 1
+        @param obstacles: List of sprites, or of L{pygame.Rect}s (like
+            the ones from L{Tile.TileMap.solid_rects}).
+        @param passes: Most times to go through the list.
 
-                if sy < oy:
-                    oy += 1
-                elif sy > oy:
-                    oy -= 1
+        @return: C{(dx, dy)} total distance the sprite was moved.
 
-            self._set_position((sx, sy))
-            self.set_crect()
+        """
 
-            if move_both:
-                other._set_position((ox, oy))
-                other.set_crect()
+        rects = []
+        for obstacle in obstacles:
+            if hasattr(obstacle, 'crect'):
+                if obstacle is not self:
+                    rects.append(obstacle.crect)
+            else:
+                rects.append(pygame.Rect(obstacle))
+
+        tx, ty = 0, 0
+        for p in range(passes):
+            indexes = self.crect.collidelistall(rects)
+            if not indexes:
+                break
+            for index in indexes:
+                dx, dy = rect_separation(self.crect, rects[index])
+                if dx or dy:
+                    self._move_by(dx, dy)
+                    tx += dx
+                    ty += dy
+
+        return tx, ty
+
+    def get_motion(self):
+        """return C{(dx, dy)} distance moved by the last move()."""
+
+        x, y = self.get_position()
+        xOld, yOld = self.path.positionOld
+        return (x - xOld, y - yOld)
 
-        #print 'after ', sx, sy, scx, scy, ox, oy, ocx, ocy
+    def get_swept_rect(self):
+        """return the area the C{crect} passed through in the last move()."""
+
+        dx, dy = self.get_motion()
+        return self.crect.union(self.crect.move(-int(round(dx)), -int(round(dy))))
+
+    def collide_swept(self, other):
+        """Check for a collision anywhere along the last move().
+
+        A fast sprite can move all the way past another sprite (or a
+        thin wall) in one frame, and L{collide} will miss it since it
+        only looks at where the sprites are now. This looks at where
+        the C{crect}s were before the last move() as well.
+
+        @param other: Other sprite, or a L{pygame.Rect} which does
+            not move.
+
+        @return: C{(t, normal)} where C{t} is the fraction (0 to 1) of
+            the move done when the sprites first touched, and C{normal}
+            is the C{(nx, ny)} direction of the face of other which was
+            hit, or None if there was no collision.
+
+        """
+
+        dx, dy = self.get_motion()
+        dx, dy = int(round(dx)), int(round(dy))
+        rect = self.crect.move(-dx, -dy)
+        if hasattr(other, 'crect'):
+            odx, ody = other.get_motion()
+            odx, ody = int(round(odx)), int(round(ody))
+            orect = other.crect.move(-odx, -ody)
+            dx -= odx
+            dy -= ody
+        else:
+            orect = pygame.Rect(other)
+        return rect_sweep(rect, dx, dy, orect)
+
+    def collidelist_swept(self, lothers):
+        """Find the first collision along the last move().
+
+        Only the sprites whose swept areas overlap this sprite's
+        swept area are checked closely.
+
+        @param lothers: List of other sprites, or L{pygame.Rect}s.
+
+        @return: C{(other, t, normal)} for the first collision (see
+            L{collide_swept}), or None.
+
+        """
+
+        rects = []
+        for other in lothers:
+            if hasattr(other, 'crect'):
+                rects.append(other.get_swept_rect())
+            else:
+                rects.append(other)
+
+        first = None
+        for index in self.get_swept_rect().collidelistall(rects):
+            other = lothers[index]
+            if other is self:
+                continue
+            hit = self.collide_swept(other)
+            if hit is not None and (first is None or hit[0] < first[1]):
+                first = (other, hit[0], hit[1])
+        return first
+
+    def rewind(self, t):
+        """Move sprite back along its last move().
+
+        @param t: Fraction of the move to keep. 0 puts the sprite back
+            where it started, and 1 leaves it where it is. The C{t}
+            from L{collide_swept} puts it where it first touched.
+
+        """
+
+        dx, dy = self.get_motion()
+        xOld, yOld = self.path.positionOld
+        self._set_position((xOld + t*dx, yOld + t*dy))
+
+    def _move_by(self, dx, dy):
+        """Move sprite without checking the arguments."""
+
+        position = self.position
+        self._set_position((position[0] + dx, position[1] + dy))
 
     def set_crect(self, crect=None):
         """set the collision L{pygame.Rect} used for collision checking.
@@ -955,7 +1453,7 @@ class Drawable(Sprite):
         """
 
         if crect is None:
-            if hasattr(self, 'crect'):
+            if self.crect is not None:
                 self.crect.center = self.rect.center
             else:
                 self.crect = pygame.Rect(self.rect)
@@ -976,7 +1474,68 @@ class Drawable(Sprite):
 
         """
 
-        return self.crect.colliderect(other.crect)
+        if not self.crect.colliderect(other.crect):
+            return 0
+        if self.mask_collide or other.mask_collide:
+            return self.collide_mask(other)
+        return 1
+
+    def set_mask_collide(self, mask_collide=1):
+        """Check collisions pixel by pixel.
+
+        Sprites with mask collisions only collide where the
+        non-transparent parts of their images overlap (after the
+        C{crect}s overlap), so rotated and irregular sprites do not
+        collide on their empty corners. If either sprite uses mask
+        collisions, both sprites' images are compared.
+
+        Needs pygame 1.8 or later. With older versions, this does
+        nothing and the C{crect} is used as usual.
+
+        @param mask_collide: True to use masks, False to go back to
+            using only the C{crect}.
+
+        """
+
+        self.mask_collide = mask_collide and Util.have_mask
+        if self.mask_collide:
+            self.prepare_masks()
+
+    def prepare_masks(self):
+        """Make the collision masks for all of this sprite's images now.
+
+        Otherwise each mask is made the first time it is needed.
+
+        """
+
+        images = [self.image]
+        if hasattr(self, 'images'):
+            if type(self.images) is type({}):
+                images.extend(self.images.values())
+            else:
+                images.extend(self.images)
+        for image in images:
+            Util.get_mask(image)
+
+    def get_mask(self):
+        """return the collision mask for the current image."""
+
+        return Util.get_mask(self.image)
+
+    def collide_mask(self, other):
+        """return True if the images of this sprite and other overlap.
+
+        Does not check the C{crect}s first. Use L{collide} for that.
+
+        """
+
+        if not Util.have_mask:
+            return self.crect.colliderect(other.crect)
+
+        rect = self.rect
+        orect = other.rect
+        offset = (int(orect.left - rect.left), int(orect.top - rect.top))
+        return self.get_mask().overlap(other.get_mask(), offset) is not None
 
     def collidelist(self, lothers):
         """return True if this sprite and any in list of others collide.
@@ -993,11 +1552,20 @@ class Drawable(Sprite):
 
         rects = [o.crect for o in lothers]
 
-        index = self.crect.collidelist(rects)
-        if index == -1:
-            return 0
-        else:
-            return lothers[index]
+        if not self.mask_collide:
+            index = self.crect.collidelist(rects)
+            if index == -1:
+                return 0
+            elif not lothers[index].mask_collide:
+                return lothers[index]
+
+        for index in self.crect.collidelistall(rects):
+            other = lothers[index]
+            if not (self.mask_collide or other.mask_collide):
+                return other
+            elif self.collide_mask(other):
+                return other
+        return 0
 
     def collidelistall(self, lothers):
         """return True if this sprite and any in list of others collide.
@@ -1018,7 +1586,14 @@ class Drawable(Sprite):
         if not indexes:
             return []
         else:
-            return [lothers[index] for index in indexes]
+            colliding = []
+            for index in indexes:
+                other = lothers[index]
+                if self.mask_collide or other.mask_collide:
+                    if not self.collide_mask(other):
+                        continue
+                colliding.append(other)
+            return colliding
 
     def set_path(self, path):
         """set which path to follow
@@ -1087,7 +1662,8 @@ class Drawable(Sprite):
 
         @param target: Sprite to check for visibility.
         @param blocking_rects_list: List of L{pygame.Rect}s which can block
-            the visibility.
+            the visibility, or a L{Sight.LineOfSight} which is much
+            faster when there are many rects.
 
         @returns: True if line of sight is clear, or False if it is blocked.
         @rtype: bool
@@ -1097,6 +1673,8 @@ class Drawable(Sprite):
         los_line_p1 = self.crect.center
         los_line_p2 = target.crect.center
 
+        if isinstance(blocking_rects_list, Sight.LineOfSight):
+            return blocking_rects_list.can_see(los_line_p1, los_line_p2)
 
         # check each candidate rect against this los line. If any of them
         # intersect, the los is blocked.
@@ -1112,6 +1690,345 @@ class Drawable(Sprite):
                 return 0
         return 1
 
+    def can_see_list(self, targets, blocking):
+        """Line of sight check to each of a list of targets.
+
+        @param targets: List of sprites to check for visibility.
+        @param blocking: L{Sight.LineOfSight} with the rects which can
+            block the visibility.
+
+        @return: List with True for each target which can be seen.
+
+        """
+
+        center = self.crect.center
+        lines = []
+        for target in targets:
+            lines.append((center, target.crect.center))
+        return blocking.can_see_list(lines)
+
+    def get_visible(self, sprites, blocking, bounds=None):
+        """return the sprites which can be seen from this sprite.
+
+        The area which can be seen is found only once (see
+        L{Sight.LineOfSight.visibility_polygon}) and then all of the
+        sprites are checked against it, instead of checking a
+        separate sightline to each sprite.
+
+        @param sprites: List of sprites to check.
+        @param blocking: L{Sight.LineOfSight} with the rects which can
+            block the visibility.
+        @param bounds: L{pygame.Rect} the view stops at.
+
+        """
+
+        points = []
+        for sprite in sprites:
+            points.append(sprite.crect.center)
+        seen = blocking.visible_points(self.crect.center, points, bounds)
+
+        visible = []
+        for n in range(len(sprites)):
+            if seen[n]:
+                visible.append(sprites[n])
+        return visible
+
+class Pool:
+    """Spare sprites to use again instead of making new ones.
+
+    Making a sprite does quite a bit of work (setting up the path,
+    the rects, and usually the image), which is wasted on things like
+    bullets that only last a moment. Sprites from a pool go back in
+    to the pool when they are killed, and L{get} hands them out again
+    after calling their C{reinit} method.
+
+    """
+
+    def __init__(self, cls, size=0, args=(), kw=None, group=None):
+        """Initialize the pool.
+
+        @param cls: Class of sprite to keep. Should be a subclass of
+            L{Drawable}.
+        @param size: Number of sprites to make right away.
+        @param args: Arguments used to make each new sprite.
+        @param kw: Keyword arguments used to make each new sprite.
+        @param group: L{SpriteGroup} (or list of groups) that sprites
+            are added to when they are handed out.
+
+        """
+
+        self.cls = cls
+        self.args = args
+        if kw is None:
+            kw = {}
+        self.kw = kw
+        self.group = group
+        self.free = []
+        self.made = 0
+        self.hits = 0
+        self.misses = 0
+        self.preallocate(size)
+
+    def _make(self):
+        sprite = apply(self.cls, self.args, self.kw)
+        sprite.pool = self
+        sprite._in_pool = 0
+        self.made += 1
+        return sprite
+
+    def preallocate(self, n):
+        """Make n more sprites and put them in the pool."""
+
+        for i in range(n):
+            sprite = self._make()
+            sprite._in_pool = 1
+            self.free.append(sprite)
+
+    def get(self, *args, **kw):
+        """return a sprite, from the pool if there is one.
+
+        Any arguments are passed to the sprite's C{reinit} method.
+
+        """
+
+        if self.free:
+            sprite = self.free.pop()
+            sprite._in_pool = 0
+            self.hits += 1
+        else:
+            sprite = self._make()
+            self.misses += 1
+        sprite.reinit(*args, **kw)
+        if self.group is not None:
+            sprite.add(self.group)
+        return sprite
+
+    def release(self, sprite):
+        """Put a sprite back in the pool.
+
+        Called by L{Drawable.kill}, so usually there is no need to
+        call this directly.
+
+        """
+
+        if sprite._in_pool:
+            return
+        if sprite.alive():
+            # kill() will put it back in the pool
+            sprite.kill()
+            return
+        sprite._in_pool = 1
+        self.free.append(sprite)
+
+    def get_hit_rate(self):
+        """return fraction of L{get} calls which reused a sprite."""
+
+        gets = self.hits + self.misses
+        if not gets:
+            return 0.0
+        return self.hits / float(gets)
+
+    def get_stats(self):
+        """return dictionary with the number of C{hits}, C{misses},
+        sprites C{made} in total, sprites C{free} in the pool, and the
+        C{hit_rate}.
+
+        """
+
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'made': self.made,
+                'free': len(self.free),
+                'hit_rate': self.get_hit_rate()}
+
+
+class LightSprite(object):
+    """Small, fast sprite for when there are very many sprites.
+
+    Uses C{__slots__} instead of an instance dictionary, so each
+    sprite takes much less memory than a L{Drawable} and getting at
+    its attributes is quicker. New attributes can not be added to
+    a C{LightSprite} unless a subclass lists them in its own
+    C{__slots__}.
+
+    Works with L{SpriteGroup} like any other sprite, and has the
+    most used parts of the L{Drawable} API, including the collision
+    checks. By default it follows a L{Path.LightPath}.
+
+    """
+
+    __slots__ = ('window', 'screen', 'bg', 'image', 'rect', 'crect',
+                    'position', 'path', 'hidden', 'pool', '_in_pool',
+                    '_groups', '__weakref__')
+    # LightSprites only check their crect, but other sprites may use masks
+    mask_collide = 0
+
+    def __init__(self, w=None, image=None, path=None):
+        """Initialize the sprite.
+
+        @param w: Layer on which sprite lives.
+        @param image: L{pygame.Surface} to show.
+        @param path: Path to follow. Default is a new L{Path.LightPath}.
+
+        """
+
+        if w is None:
+            if hasattr(conf, 'window'):
+                w = conf.window
+            else:
+                w = Screen.Window()
+        self.window = w
+        self.screen = w.screen
+        self.bg = w.bg
+        self._groups = {}
+        self.hidden = 0
+        self.pool = None
+        self._in_pool = 0
+
+        self.image = image
+        if image is not None:
+            self.rect = image.get_rect()
+        else:
+            self.rect = pygame.Rect(0, 0, 0, 0)
+        self.crect = pygame.Rect(self.rect)
+
+        self.position = [0, 0]
+        if path is None:
+            path = Path.LightPath()
+        self.set_path(path)
+
+    # the parts of pygame.sprite.Sprite which groups use
+    def add(self, *groups):
+        for group in groups:
+            group.add(self)
+
+    def remove(self, *groups):
+        for group in groups:
+            if self._groups.has_key(group):
+                group.remove_internal(self)
+                self.remove_internal(group)
+
+    def add_internal(self, group):
+        self._groups[group] = 0
+
+    def remove_internal(self, group):
+        del self._groups[group]
+
+    def update(self, *args):
+        pass
+
+    def groups(self):
+        return self._groups.keys()
+
+    def alive(self):
+        return len(self._groups) > 0
+
+    def kill(self):
+        """Remove sprite from all groups.
+
+        If the sprite came from a L{Pool}, it goes back in the pool.
+
+        """
+
+        for group in self._groups.keys():
+            group.remove_internal(self)
+        self._groups.clear()
+        if self.pool is not None:
+            self.pool.release(self)
+
+    def reinit(self, position=None):
+        """Get a used sprite ready to go again. See L{Drawable.reinit}."""
+
+        self.hidden = 0
+        self.path.reset()
+        if position is not None:
+            self.path.set_position(position)
+        self._set_position(self.path.get_position())
+
+    def set_path(self, path):
+        """set which path to follow"""
+
+        self.path = path
+        position = path.get_position()
+        path.position = self.position
+        self._set_position(position)
+
+    def move(self):
+        """move sprite to next position along its path"""
+
+        self._set_position(self.path.next())
+
+    def _set_position(self, location):
+        x, y = location
+        position = self.position
+        position[0] = x
+        position[1] = y
+        rect = self.rect
+        rect[0] = x
+        rect[1] = y
+        self.crect.center = rect.center
+
+    def set_position(self, location):
+        """Move sprite to location C{(x, y)}."""
+
+        self.path.set_position(location)
+        self._set_position(location)
+
+    def get_position(self):
+        """return position of sprite"""
+
+        return self.position[0:2]
+
+    def set_crect(self, crect=None):
+        """set the collision L{pygame.Rect}. See L{Drawable.set_crect}."""
+
+        if crect is not None:
+            self.crect = pygame.Rect(crect)
+        self.crect.center = self.rect.center
+
+    def collide(self, other):
+        """return True if this sprite and other sprite overlap."""
+
+        if not self.crect.colliderect(other.crect):
+            return 0
+        if other.mask_collide:
+            return self.collide_mask(other)
+        return 1
+
+    # these only need the attributes a LightSprite has too
+    get_size = Drawable.get_size.im_func
+    onscreen = Drawable.onscreen.im_func
+    get_mask = Drawable.get_mask.im_func
+    collide_mask = Drawable.collide_mask.im_func
+    collidelist = Drawable.collidelist.im_func
+    collidelistall = Drawable.collidelistall.im_func
+    get_motion = Drawable.get_motion.im_func
+    get_swept_rect = Drawable.get_swept_rect.im_func
+    collide_swept = Drawable.collide_swept.im_func
+    collidelist_swept = Drawable.collidelist_swept.im_func
+    rewind = Drawable.rewind.im_func
+    _move_by = Drawable._move_by.im_func
+    solid = Drawable.solid.im_func
+    separate = Drawable.separate.im_func
+
+    def draw(self, surface=None):
+        """Blit image to layer. See L{Drawable.draw}."""
+
+        if surface is None:
+            surface = self.screen
+        return surface.blit(self.image, self.rect)
+
+    def clear(self, surface=None):
+        """Erase sprite to background. See L{Drawable.clear}."""
+
+        if surface is None:
+            surface = self.screen
+        return surface.blit(self.bg, self.rect, self.rect)
+
+    def __repr__(self):
+        return "<%s sprite(in %d groups)>" % (self.__class__.__name__, len(self._groups))
+
+
 class Layer(Drawable, Screen.Layer):
     """Screen that can be used as a sprite"""
 
@@ -1136,10 +2053,16 @@ class Layer(Drawable, Screen.Layer):
     def updateContents(self):
         """move and re-draw all the sprites that use this layer"""
 
+        timed = Timing.enabled
+        if timed:
+            start = Timing.timer()
         self.sprites.clear()
         self.sprites.move()
         dirty = self.sprites.draw()
         #self.update(dirty)
+        if timed:
+            Timing.record(self.__class__.__name__ + '.updateContents',
+                            Timing.timer() - start)
 
     def draw(self, surface=None):
         """draw image, returning affected rect"""
@@ -1832,6 +2755,13 @@ class MultiRotated(RotatedImage):
         self.flip_images_ticks = 0
         self.reset_flip_images()
 
+    def prepare_masks(self):
+        """Make the collision masks for all of the images now."""
+
+        for rotated in self._images.values():
+            rotated.prepare_masks()
+        RotatedImage.prepare_masks(self)
+
     def set_flip_images_rate(self, rate):
         """Used to animate the images automatically.
 
@@ -2049,7 +2979,7 @@ class Multi(Drawable, pygame.sprite.RenderUpdates):
     def kill(self):
         for sprite in self.innerSprites():
             sprite.kill()
-        Sprite.kill(self)
+        Drawable.kill(self)
 
     def draw(self):
         """Draw all of the sprites in the group.
@@ -2228,18 +3158,22 @@ class Stationary(Drawable):
 
     """
 
-    def __init__(self, w=None, sprite=None):
+    def __init__(self, w=None, sprite=None, batch=None):
         """Initialize the sprite.
 
         @param w: C{Layer} on which the sprite will be drawn.
         @param sprite: C{Drawable} from which to get the image.
             Uses the C{.image} attribute of the sprite.
+        @param batch: L{StationaryBatch} which will collect the
+            display updates, or None to update the display
+            each time the sprite is drawn or cleared.
 
         """
 
         if sprite is None:
             sprite = Image()
         self.sprite = sprite
+        self.batch = batch
         Drawable.__init__(self, w)
         self.prepare()
         self.crect = pygame.Rect(self.rect)
@@ -2253,9 +3187,12 @@ class Stationary(Drawable):
         sprite = self.sprite
         self.image = sprite.image
         self.rect = sprite.rect
-        self.bg = pygame.Surface(self.image.get_size())
 
-        self.bg.blit(self.window.bg, (0, 0), self.rect)
+        if self.batch is not None:
+            self.bg = self.batch.save(self.rect)
+        else:
+            self.bg = pygame.Surface(self.image.get_size())
+            self.bg.blit(self.window.bg, (0, 0), self.rect)
 
     def draw(self):
         """Blit image to both background and foreground."""
@@ -2263,7 +3200,10 @@ class Stationary(Drawable):
         rect = self.rect
         self.window.bg.blit(self.image, rect)
         self.window.screen.blit(self.image, rect)
-        pygame.display.update(rect)
+        if self.batch is not None:
+            self.batch.touch(rect)
+        else:
+            pygame.display.update(rect)
 
     def clear(self):
         """Blit saved background to both background and foreground."""
@@ -2276,7 +3216,10 @@ class Stationary(Drawable):
         self.window.screen.blit(self.bg, self.rect, r)
         #print 'updating stationary'
         #print 'statrect', self.rect
-        pygame.display.update(self.rect)
+        if self.batch is not None:
+            self.batch.touch(self.rect)
+        else:
+            pygame.display.update(self.rect)
 
     def set_position(self, position):
         """Move the sprite.
@@ -2315,7 +3258,16 @@ class StationaryStack:
 
     """
 
-    def __init__(self, w=None):
+    def __init__(self, w=None, batch=None):
+        """Initialize the stack.
+
+        @param w: C{Layer} on which the sprites will be drawn.
+        @param batch: L{StationaryBatch} to collect the display
+            updates of the sprites pushed on to the stack, or None
+            to update the display for each sprite.
+
+        """
+
         if w is None:
             if hasattr(conf, 'window'):
                 w = conf.window
@@ -2324,6 +3276,7 @@ class StationaryStack:
                 w = Screen.Window()
                 #print 'bbb', w
         self.window = w
+        self.batch = batch
         self.stack = []
 
     def push(self, stationary):
@@ -2331,7 +3284,9 @@ class StationaryStack:
 
         if not issubclass(stationary.__class__, Stationary):
             #print 'making stationary'
-            stationary = Stationary(self.window, stationary)
+            stationary = Stationary(self.window, stationary, self.batch)
+        elif self.batch is not None and stationary.batch is None:
+            stationary.batch = self.batch
         stationary.draw()
         #print 'adding', id(stationary), stationary.get_position()
         self.stack.append(stationary)
@@ -2353,10 +3308,131 @@ class StationaryStack:
 
         while 1:
             if not self.pop():
-                pygame.display.update()
+                if self.batch is not None:
+                    self.batch.commit()
+                else:
+                    pygame.display.update()
                 break
 
 
+class StationaryBatch:
+    """Collects the display updates of many L{Stationary} sprites.
+
+    Normally each C{Stationary} updates the display as soon as it is
+    drawn or cleared. Building up a board of hundreds of pieces that
+    way means hundreds of separate display updates. Sprites which
+    are given a batch instead only record the area they changed, and
+    L{commit} updates all of those areas at once, with overlapping
+    areas merged together.
+
+    Between L{begin} and L{commit} the background is saved once, and
+    the sprites keep subsurfaces of that copy instead of each making
+    their own copy of the background underneath them. Anything which
+    changes the background in the meantime should call L{touch} so
+    that sprites placed there later save a fresh copy.
+
+    """
+
+    def __init__(self, w=None):
+        """Initialize the batch.
+
+        @param w: C{Layer} on which the sprites will be drawn.
+
+        """
+
+        if w is None:
+            if hasattr(conf, 'window'):
+                w = conf.window
+            else:
+                w = Screen.Window()
+        self.window = w
+        self.snapshot = None
+        self.touched = []
+        self.dirty = []
+
+    def begin(self):
+        """Start a group of changes to the background."""
+
+        self.snapshot = self.window.bg.copy()
+        self.touched = []
+
+    def save(self, rect):
+        """return the background underneath rect.
+
+        Uses a subsurface of the saved background if nothing has
+        been drawn in that area since L{begin}, otherwise makes a copy.
+
+        @param rect: L{pygame.Rect} about to be drawn over.
+
+        """
+
+        snapshot = self.snapshot
+        if snapshot is not None and rect.collidelist(self.touched) == -1:
+            try:
+                return snapshot.subsurface(rect)
+            except ValueError:
+                # not entirely inside of the background
+                pass
+
+        bg = pygame.Surface(rect.size)
+        bg.blit(self.window.bg, (0, 0), rect)
+        return bg
+
+    def touch(self, rect):
+        """Record that rect has been changed and needs updating."""
+
+        rect = pygame.Rect(rect)
+        if self.snapshot is not None:
+            self.touched.append(rect)
+        self.dirty.append(rect)
+
+    def add(self, stationary):
+        """Have the stationary sprite use this batch."""
+
+        stationary.batch = self
+
+    def remove(self, stationary):
+        """Have the stationary sprite update the display by itself again."""
+
+        if stationary.batch is self:
+            stationary.batch = None
+
+    def coalesce(self, rects):
+        """return list of rects with any overlapping rects merged."""
+
+        rects = rects[:]
+        merged = []
+        while rects:
+            r = rects.pop()
+            i = r.collidelist(rects)
+            while i != -1:
+                r = r.union(rects.pop(i))
+                i = r.collidelist(rects)
+            j = r.collidelist(merged)
+            if j != -1:
+                rects.append(r.union(merged.pop(j)))
+            else:
+                merged.append(r)
+        return merged
+
+    def commit(self):
+        """Update the display for everything changed since the last commit.
+
+        Also ends the group of changes started with L{begin}.
+
+        @return: List of rects which were updated.
+
+        """
+
+        dirty = self.coalesce(self.dirty)
+        self.dirty = []
+        self.snapshot = None
+        self.touched = []
+        if dirty:
+            pygame.display.update(dirty)
+        return dirty
+
+
 class Turtle(RotatedImage):
     """Turtle-graphics-like object"""
 
@@ -2369,6 +3445,17 @@ class Turtle(RotatedImage):
                                 convert=convert)
         self._window = self.window
         self.saved_state = []
+        self.transaction_interactive = 0
+        self._layers = []
+
+        self.batch_size = 0
+        self._batch_count = 0
+        self._batch_dirty = []
+        self._batch_shown = 0
+
+        self.display_list = None
+        self._record_only = 0
+        self._record_marks = []
 
         self._filling = 0
         self._to_fill = []
@@ -2408,30 +3495,101 @@ class Turtle(RotatedImage):
     def begin(self, interactive=1):
         """Start a new layer for drawing.
 
-        Use commit() to copy layer to the base window, or
-        use rollback() to throw away the layer and
-        return to drawing directly to the base window.
+        Use commit() to copy layer to the window (or to the layer
+        of the enclosing transaction), or use rollback() to throw
+        away the layer.
+
+        Transactions can be nested. Only the area drawn on since
+        begin() is copied or thrown away, so small changes are cheap
+        even on a large window.
+
+        @param interactive: If True, show the drawing as it is made.
+            Otherwise, nothing is shown until commit().
 
         """
 
-        if self.saved_state:
-            # only supports one-level of transaction right now
-            # should not be too tough to extend this to more
-            raise NotImplementedError
+        self.flush()
 
-        self.transaction_interactive = interactive
+        if self.display_list is not None:
+            self._record_marks.append(self.display_list.mark())
 
         self.uclear()
-        self._window.clear()
-        self.saved_state.append((self.get_position(), self.get_deg(), self.window))
-        self.window = Layer(color=self.bgColor)
-        self.screen = self.window.screen
-        self.bg = self.window.bg
-        self.screen.set_colorkey(self.bgColor)
-        self.bg.set_colorkey(self.bgColor)
+        layer = self._get_layer(len(self.saved_state))
+        self.saved_state.append([self.get_position(), self.get_deg(),
+                                    self.window, layer, interactive, None])
+        self.transaction_interactive = interactive
+        self.window = layer
+        self.screen = layer.screen
+        self.bg = layer.bg
         if self.visible and interactive:
-            self.draw()
-        self.update()
+            self.update([self.draw()])
+
+    def _get_layer(self, depth):
+        """return an empty layer for a transaction depth levels deep.
+
+        Layers are kept for reuse, and are cleaned up at the end of
+        each transaction, so they only need to be made once.
+
+        """
+
+        layers = self._layers
+        size = self._window.screen.get_size()
+        if depth < len(layers):
+            layer, color = layers[depth]
+            if layer.screen.get_size() == size:
+                if color != self.bgColor:
+                    color = self.bgColor
+                    for surface in layer.screen, layer.bg:
+                        surface.fill(color)
+                        surface.set_colorkey(color)
+                    layers[depth] = (layer, color)
+                return layer
+
+        layer = Layer(w=self._window, color=self.bgColor)
+        layer.screen.set_colorkey(self.bgColor)
+        layer.bg.set_colorkey(self.bgColor)
+        if depth < len(layers):
+            layers[depth] = (layer, self.bgColor)
+        else:
+            layers.append((layer, self.bgColor))
+        return layer
+
+    def _clean_layer(self, layer, rect):
+        """Erase rect of layer, so it can be used again."""
+
+        color = self.bgColor
+        layer.screen.fill(color, rect)
+        layer.bg.fill(color, rect)
+
+    def _compose(self, rect):
+        """Rebuild rect of the window from its background and any
+        interactive transaction layers on top of it.
+
+        """
+
+        window = self._window
+        screen = window.screen
+        screen.blit(window.bg, rect, rect)
+        for state in self.saved_state:
+            if state[4]:
+                screen.blit(state[3].bg, rect, rect)
+
+    def _end_transaction(self):
+        """Pop the innermost transaction and go back to its parent.
+
+        @return: C{(position, deg, layer, touched)} of the transaction.
+
+        """
+
+        position, deg, window, layer, interactive, touched = self.saved_state.pop()
+        self.window = window
+        self.screen = window.screen
+        self.bg = window.bg
+        if self.saved_state:
+            self.transaction_interactive = self.saved_state[-1][4]
+        else:
+            self.transaction_interactive = 0
+        return position, deg, layer, touched
 
     def begin_fill(self):
         """Start saving points for filling a polygon later
@@ -2460,17 +3618,30 @@ class Turtle(RotatedImage):
             # not in transaction
             return
 
+        self.flush()
+        if self._record_marks:
+            self._record_marks.pop()
         self.uclear()
-        self.window.draw()
-        position, deg, window = self.saved_state.pop()
-        window.bg.blit(self.bg, (0, 0))
-        self.window = window
-        self.screen = self.window.screen
-        self.bg = self.window.bg
-        self.window.clear()
+        position, deg, layer, touched = self._end_transaction()
+
+        if touched is not None:
+            self.bg.blit(layer.bg, touched, touched)
+            self.screen.blit(layer.bg, touched, touched)
+            self._clean_layer(layer, touched)
+            if self.saved_state:
+                state = self.saved_state[-1]
+                if state[5] is None:
+                    state[5] = touched
+                else:
+                    state[5] = state[5].union(touched)
+            self._compose(touched)
+            dirty = [touched]
+        else:
+            dirty = []
+
         if self.visible:
-            self.draw()
-        self.update()
+            dirty.append(self.draw())
+        self.update(dirty)
 
     def commit_fill(self, color=None):
         """Fill the polygon of saved points
@@ -2491,14 +3662,18 @@ class Turtle(RotatedImage):
         if color is not None:
             self.set_color(color)
 
-        pygame.draw.polygon(self.window.screen, self.color,
-                                            self._to_fill, 0)
-        dirty = [pygame.draw.polygon(self.window.bg, self.color,
-                                            self._to_fill, 0)]
+        if self.display_list is not None:
+            self.display_list.polygon(self.color, self._to_fill)
 
-        if self.visible:
-            dirty.append(self.draw())
-        self.update(dirty)
+        if not self._record_only:
+            pygame.draw.polygon(self.window.screen, self.color,
+                                                self._to_fill, 0)
+            dirty = [pygame.draw.polygon(self.window.bg, self.color,
+                                                self._to_fill, 0)]
+
+            if self.visible:
+                dirty.append(self.draw())
+            self.update(dirty)
 
         self._filling = 0
         self._to_fill = []
@@ -2514,17 +3689,26 @@ class Turtle(RotatedImage):
             # not in transaction
             return
 
-        self.clear()
-        position, deg, window = self.saved_state.pop()
-        self.moveTo(position)
-        self.turnTo(deg)
-        self.window = window
-        self.screen = self.window.screen
-        self.bg = self.window.bg
-        self._window.clear()
+        self.flush()
+        if self._record_marks:
+            self.display_list.truncate(self._record_marks.pop())
+        self.uclear()
+        dirty = []
+        position, deg, layer, touched = self._end_transaction()
+
+        self.set_position(position)
+        self.path.set_deg(deg)
+        self.set_rotation((deg/180.0) * PI)
+        self.move()
+
+        if touched is not None:
+            self._clean_layer(layer, touched)
+            self._compose(touched)
+            dirty.append(touched)
+
         if self.visible:
-            self.draw()
-        self.update()
+            dirty.append(self.draw())
+        self.update(dirty)
 
     def rollback_fill(self):
         """Throw out list of saved points
@@ -2537,6 +3721,13 @@ class Turtle(RotatedImage):
     def draw(self, surface=None):
         """draw image, returning affected rect"""
 
+        if (self.batch_size or self._record_only) and surface is None:
+            # turtle is drawn only when the batch is flushed
+            return pygame.Rect(self.rect)
+
+        return self._draw(surface)
+
+    def _draw(self, surface=None):
         if self.saved_state and self.transaction_interactive:
             self._window.screen.blit(self.image, self.rect)
         Drawable.draw(self, surface)
@@ -2546,21 +3737,162 @@ class Turtle(RotatedImage):
     def clear(self, surface=None):
         """erase sprite image to background, returning affected rect"""
 
+        if self._record_only and surface is None:
+            return pygame.Rect(self.rect)
+
+        if self.batch_size and surface is None:
+            if not self._batch_shown:
+                return pygame.Rect(self.rect)
+            self._batch_shown = 0
+
         Drawable.clear(self, surface)
         if self.saved_state and self.transaction_interactive:
-            self._window.clear()
-            self.update()
+            # the caller updates the display
+            self._compose(self.rect)
 
         return pygame.Rect(self.rect)
 
+    def set_batch(self, size=500):
+        """Draw without updating the display after every command.
+
+        Normally the turtle is redrawn and the display updated after
+        each move, which is slow when drawing thousands of lines. In
+        batch mode the turtle is not redrawn and the areas changed are
+        saved up until C{size} commands have been given, or until
+        L{flush} is called. The finished picture is the same either way.
+
+        This is like the C{tracer} setting of other turtle graphics
+        systems.
+
+        @param size: Number of commands between display updates,
+            or 0 to go back to updating after every command.
+
+        """
+
+        if size:
+            if not self.batch_size:
+                # the turtle is on the screen now
+                self._batch_shown = self.visible
+            self.batch_size = size
+        elif self.batch_size:
+            self.flush()
+            self.batch_size = 0
+
+    def flush(self):
+        """Draw the turtle and update the display for all batched commands."""
+
+        if not self.batch_size:
+            return
+
+        dirty = self._batch_dirty
+        if self.visible and not self._batch_shown:
+            rect = self._draw()
+            if dirty is not None:
+                dirty.append(rect)
+            self._batch_shown = 1
+        elif not self._batch_count:
+            return
+        self._update(dirty)
+
+        self._batch_count = 0
+        self._batch_dirty = []
+
+    def start_recording(self, draw=1, display_list=None):
+        """Start keeping a display list of the drawing.
+
+        Lines, circles, fills, text, and rectangles drawn from now on
+        are recorded in a L{Record.DisplayList}, which can later be
+        replayed at any size or saved as a PNG or SVG file.
+
+        @param draw: If False, nothing is drawn on the screen while
+            recording, which is much faster. The turtle still moves
+            and turns as usual.
+        @param display_list: L{Record.DisplayList} to add to, or None
+            to start a new one.
+
+        @return: The display list.
+
+        """
+
+        if display_list is None:
+            display_list = Record.DisplayList(self.window.screen.get_size(),
+                                                self.bgColor)
+        self.display_list = display_list
+        self._record_marks = []
+
+        if not draw and not self._record_only:
+            self.flush()
+            self.uclear()
+            self._record_only = 1
+
+        return display_list
+
+    def stop_recording(self):
+        """Stop recording, and go back to drawing on the screen.
+
+        @return: The L{Record.DisplayList} which was being recorded.
+
+        """
+
+        display_list = self.display_list
+        self.display_list = None
+        self._record_marks = []
+
+        if self._record_only:
+            self._record_only = 0
+            self._batch_shown = 0
+            if self.visible:
+                self.udraw()
+
+        return display_list
+
     def update(self, dirty=None):
-        """Update the display"""
+        """Update the display
 
+        In batch mode (see L{set_batch}) this only records the dirty
+        areas, and the display is updated every C{batch_size} calls.
+
+        """
+
+        if self._record_only:
+            return
+
+        if self.batch_size:
+            batch_dirty = self._batch_dirty
+            if dirty is None:
+                # the whole window
+                self._batch_dirty = None
+            elif batch_dirty is not None:
+                batch_dirty.extend(dirty)
+            self._batch_count += 1
+            if self._batch_count >= self.batch_size:
+                self.flush()
+        else:
+            self._update(dirty)
+
+    def _update(self, dirty=None):
         if self.saved_state:
             #print 'updating'
+            if dirty is None:
+                dirty = [self.bg.get_rect()]
+            else:
+                dirty = [pygame.Rect(r) for r in dirty if r]
+            if not dirty:
+                return
+
+            state = self.saved_state[-1]
+            touched = dirty[0].unionall(dirty[1:])
+            if state[5] is not None:
+                touched.union_ip(state[5])
+            state[5] = touched
+
             if self.transaction_interactive:
-                self._window.screen.blit(self.bg, (0, 0))
-                self._window.update()
+                screen = self._window.screen
+                for rect in dirty:
+                    screen.blit(self.bg, rect, rect)
+                if self.visible:
+                    screen.blit(self.image, self.rect)
+                self._window.update(dirty)
         else:
             #print 'normal'
             self._window.update(dirty)
@@ -2578,6 +3910,9 @@ class Turtle(RotatedImage):
         if color is None:
             color = self.bgColor
 
+        if self.display_list is not None:
+            self.display_list.background(self.bgColor, color)
+
         save = pygame.Surface(self.window.screen.get_size())
         save.blit(self.bg, (0, 0))
         save.set_colorkey(self.bgColor)
@@ -2609,6 +3944,9 @@ class Turtle(RotatedImage):
 
         """
 
+        if self.display_list is not None:
+            self.display_list.clear(self.bgColor)
+
         self.window.set_background(color=self.bgColor)
         self.bg = self.window.bg
         self.window.clear()
@@ -2625,7 +3963,8 @@ class Turtle(RotatedImage):
         """
 
         self.rollback_fill()
-        self.rollback()
+        while self.saved_state:
+            self.rollback()
 
         self.uclear()
         self.set_color(self.COLOR)
@@ -2933,6 +4272,12 @@ class Turtle(RotatedImage):
 
         """
 
+        if self.display_list is not None:
+            # p2 is where the turtle was, so record from there
+            self.display_list.line(p2, p1, self.color, self.width)
+            if self._record_only:
+                return pygame.Rect(0, 0, 0, 0)
+
         dirty = pygame.draw.line(self.bg, self.color, p1, p2, self.width)
         self.screen.blit(self.bg, dirty, dirty)
 
@@ -3032,11 +4377,15 @@ class Turtle(RotatedImage):
             # width must be less than radius
             width = min(self.width, radius)
 
-        rect = pygame.draw.circle(self.bg, color, (cx, cy), radius, width)
-        dirty = [self.screen.blit(self.bg, rect, rect)]
-        if self.visible:
-            dirty.append(self.draw())
-        self.update(dirty)
+        if self.display_list is not None:
+            self.display_list.circle(color, (cx, cy), radius, width)
+
+        if not self._record_only:
+            rect = pygame.draw.circle(self.bg, color, (cx, cy), radius, width)
+            dirty = [self.screen.blit(self.bg, rect, rect)]
+            if self.visible:
+                dirty.append(self.draw())
+            self.update(dirty)
         self.set_color(save_color)
 
     def cCircle(self, radius, color=None, width=None):
@@ -3080,11 +4429,15 @@ class Turtle(RotatedImage):
         cx = int(cx)
         cy = int(cy)
         radius = int(radius)
-        rect = pygame.draw.circle(self.bg, color, (cx, cy), radius, width)
-        dirty = [self.screen.blit(self.bg, rect, rect)]
-        if self.visible:
-            dirty.append(self.draw())
-        self.update(dirty)
+        if self.display_list is not None:
+            self.display_list.circle(color, (cx, cy), radius, width)
+
+        if not self._record_only:
+            rect = pygame.draw.circle(self.bg, color, (cx, cy), radius, width)
+            dirty = [self.screen.blit(self.bg, rect, rect)]
+            if self.visible:
+                dirty.append(self.draw())
+            self.update(dirty)
         self.set_color(save_color)
 
     def set_fontSize(self, fontSize=40):
@@ -3129,11 +4482,14 @@ class Turtle(RotatedImage):
         else:
             ix = x
             iy = y - (th * math.cos(rad))
-        self.bg.blit(image, (ix, iy))
-        dirty = [self.screen.blit(image, (ix, iy))]
-        if self.visible:
-            dirty.append(self.draw())
-        self.update(dirty)
+        if self.display_list is not None:
+            self.display_list.image(image, (ix, iy))
+        if not self._record_only:
+            self.bg.blit(image, (ix, iy))
+            dirty = [self.screen.blit(image, (ix, iy))]
+            if self.visible:
+                dirty.append(self.draw())
+            self.update(dirty)
         self.set_fontSize(saveFontSize)
         return tw
 
@@ -3208,12 +4564,15 @@ class Turtle(RotatedImage):
         else:
             ix = x
             iy = y - (th * math.cos(rad))
-        self.bg.blit(image, (ix, iy))
-        dirty = [self.screen.blit(image, (ix, iy))]
+        if self.display_list is not None:
+            self.display_list.image(image, (ix, iy))
         self.path.set_deg(deg_original)
-        if self.visible:
-            dirty.append(self.draw())
-        self.update(dirty)
+        if not self._record_only:
+            self.bg.blit(image, (ix, iy))
+            dirty = [self.screen.blit(image, (ix, iy))]
+            if self.visible:
+                dirty.append(self.draw())
+            self.update(dirty)
 
 
     def cRectangle(self, side_length=20, side_width=10, width=None,
@@ -3433,7 +4792,7 @@ class EuclidTurtle(Turtle):
         self.move()
         if self.visible:
             dirty.append(self.draw())
-        self.window.update(dirty)
+        self.update(dirty)
 
     def lineTo(self, position):
         pen = self.pen
@@ -3450,7 +4809,7 @@ class EuclidTurtle(Turtle):
         self.moveTo(position)
         if self.visible:
             dirty.append(self.draw())
-        self.window.update(dirty)
+        self.update(dirty)
 
     def lineSegment(self, p1, p2):
         """Draw a line segment between 2 points.
@@ -3466,6 +4825,11 @@ class EuclidTurtle(Turtle):
         p2 = self.euclid_untranslate(p2)
         x, y = p1
         xO, yO = p2
+        if self.display_list is not None:
+            self.display_list.line(p2, p1, self.color, self.width)
+            if self._record_only:
+                return pygame.Rect(0, 0, 0, 0)
+
         dirty = pygame.draw.line(self.bg, self.color,
                                 (x, y), (xO, yO), self.width)
         self.screen.blit(self.bg, dirty, dirty)
@@ -3535,9 +4899,15 @@ class EuclidTurtle(Turtle):
         xa, ya = self.euclid_untranslate((xa, ya))
         xb, yb = self.euclid_untranslate((xb, yb))
 
+        if self.display_list is not None:
+            self.display_list.line((xa, ya), (xb, yb), self.color, self.width)
+            if self._record_only:
+                return pygame.Rect(0, 0, 0, 0)
+
         dirty = pygame.draw.line(self.window.bg, self.color,
                                 (xa, ya), (xb, yb), self.width)
         self.screen.blit(self.bg, dirty, dirty)
+        self.update([dirty])
         return dirty
 
     def forward(self, dist):
@@ -3553,7 +4923,7 @@ class EuclidTurtle(Turtle):
             dirty.append(self.lineSegment(p, pOld))
         if self.visible:
             dirty.append(self.draw())
-        self.window.update(dirty)
+        self.update(dirty)
 
     def cSquare(self, side_length=2, width=None,
                     color=None, bgColor=TRANSPARENT):
@@ -48,7 +48,11 @@ TIMEOUT = -1
 KEY = -2
 MOUSEBUTTON = -4
 
+# pygame event used to wake up EventGroup.wait on older pygame
+WAKE = pygame.NUMEVENTS - 1
+
 import conf
+import Trace
 
 
 class Event(pygame.sprite.Sprite):
@@ -615,6 +619,10 @@ class EventGroup(pygame.sprite.Group):
 
         """
 
+        if Trace.enabled:
+            self._check_traced()
+            return
+
         for pygame_event in pygame.event.get():
             pygame_event_type = pygame_event.type
             for event in self.events():
@@ -627,6 +635,92 @@ class EventGroup(pygame.sprite.Group):
             for event in self.TIMEOUT_Events.sprites():
                 event.tick(ticks)
 
+    def get_timeout(self):
+        """return milliseconds until the next L{TIMEOUT_Event} in this
+        group is due, or None if there are none.
+
+        """
+
+        soonest = None
+        for event in self.TIMEOUT_Events.sprites():
+            if event.enabled:
+                # tick() fires once the count goes below zero
+                ticks = max(event.ticks + 1, 0)
+                if soonest is None or ticks < soonest:
+                    soonest = ticks
+        return soonest
+
+    def wait(self, timeout=None):
+        """Sleep until there is something for L{check} to do.
+
+        Waits for the next pygame event, but not past the time when
+        the next L{TIMEOUT_Event} in this group is due. Then sets
+        C{conf.ticks} to the time spent waiting (but no more than
+        C{conf.MAX_TICK}, so sprites do not jump after a long wait).
+        Any more time than that is counted off of the timers here,
+        so L{check} still fires them on time.
+
+        Use this in loops which only need to respond to events,
+        instead of checking over and over as fast as possible.
+
+        @param timeout: Most milliseconds to wait. Default is no limit
+            (other than the timers).
+
+        @return: True if there was an event, or False if the wait
+            timed out.
+
+        """
+
+        start = pygame.time.get_ticks()
+
+        soonest = self.get_timeout()
+        if soonest is not None:
+            if timeout is None or soonest < timeout:
+                timeout = soonest
+
+        if pygame.event.peek():
+            ev = None
+            happened = 1
+        elif timeout is None:
+            ev = pygame.event.wait()
+            happened = 1
+        elif timeout <= 0:
+            ev = None
+            happened = 0
+        else:
+            ev = _wait_event(timeout)
+            happened = ev is not None
+
+        if ev is not None:
+            pygame.event.post(ev)
+
+        elapsed = pygame.time.get_ticks() - start
+        ticks = min(elapsed, conf.MAX_TICK)
+        if elapsed > ticks:
+            extra = elapsed - ticks
+            for event in self.TIMEOUT_Events.sprites():
+                event.ticks = max(event.ticks - extra, 0)
+        conf.ticks = ticks
+        return happened
+
+    def _check_traced(self):
+        """L{check}, recording each callback as a span (see L{Trace})."""
+
+        start = Trace.begin()
+        for pygame_event in pygame.event.get():
+            pygame_event_type = pygame_event.type
+            for event in self.events():
+                event_type = event.type
+                if pygame_event_type == event_type:
+                    Trace.call(_callback_name(event), 'event',
+                                event.call, pygame_event)
+
+        if self.TIMEOUT_Events:
+            ticks = conf.ticks
+            for event in self.TIMEOUT_Events.sprites():
+                Trace.call(_callback_name(event), 'event', event.tick, ticks)
+        Trace.end('EventGroup.check', 'event', start)
+
     def kill(self):
         """Call the C{kill} method on every event in this group, to remove
         all of the events from all of the groups they are in.
@@ -641,3 +735,33 @@ class EventGroup(pygame.sprite.Group):
         for event in self.TIMEOUT_Events.sprites():
             event.disable()
             event.kill()
+
+
+def _callback_name(event):
+    """return a name for the callback of an Event, for traces."""
+
+    callback = event.callback
+    name = getattr(callback, '__name__', event.__class__.__name__)
+    if hasattr(callback, 'im_self') and callback.im_self is not None:
+        name = callback.im_self.__class__.__name__ + '.' + name
+    return name
+
+def _wait_event(timeout):
+    """return the next pygame event, or None if none comes within
+    timeout milliseconds.
+
+    """
+
+    try:
+        ev = pygame.event.wait(timeout)
+    except TypeError:
+        # pygame.event.wait only takes a timeout in pygame 2
+        pygame.time.set_timer(WAKE, timeout)
+        ev = pygame.event.wait()
+        pygame.time.set_timer(WAKE, 0)
+        if ev.type == WAKE:
+            ev = None
+    else:
+        if ev.type == pygame.NOEVENT:
+            ev = None
+    return ev
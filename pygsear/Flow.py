@@ -0,0 +1,350 @@
+# pygsear
+# Copyright (C) 2003 Lee Harr
+#
+#
+# This file is part of pygsear.
+#
+# pygsear is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pygsear is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pygsear; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Flow fields, for many sprites finding their way to one target.
+
+"""
+
+import math
+import array
+import heapq
+
+import pygame
+
+import conf
+
+
+STEP = 10
+DIAGONAL = 14
+FAR = 1 << 30
+
+
+class FlowField:
+    """Grid of distances to a target, going around blocked cells.
+
+    The distance from every cell to the target is found once (with
+    Dijkstra's algorithm) and each cell remembers which neighbor is
+    the next step towards the target. Any number of sprites can then
+    find their way by looking up the cell they are in. See
+    L{Path.FlowPath}.
+
+    When cells are blocked or unblocked, only the cells whose way to
+    the target changes are worked out again.
+
+    Moves may go diagonally, but not between two blocked cells
+    (cutting a corner).
+
+    """
+
+    def __init__(self, size=None, cell_size=16, rects=(), target=None):
+        """Initialize the field.
+
+        @param size: C{(width, height)} of the area covered, in pixels.
+            Default is the window size.
+        @param cell_size: Width and height of each grid cell.
+        @param rects: Sequence of L{pygame.Rect}s which cannot be
+            passed through.
+        @param target: C{(x, y)} point to find the way to.
+
+        """
+
+        if size is None:
+            size = conf.WINSIZE
+        self.cell_size = cell_size
+        self.columns = (size[0] + cell_size - 1) / cell_size
+        self.rows = (size[1] + cell_size - 1) / cell_size
+        count = self.columns * self.rows
+        self.blocked = array.array('B', [0] * count)
+        self.dist = [FAR] * count
+        self.parent = [-1] * count
+        self.target = None
+        self.target_cell = -1
+        self.cells_updated = 0
+
+        for rect in rects:
+            for index in self.rect_cells(rect):
+                self.blocked[index] = 1
+        if target is not None:
+            self.set_target(target)
+
+    def cell_at(self, point):
+        """return index of the cell holding point, or -1 if off the grid."""
+
+        x, y = point
+        size = self.cell_size
+        column = int(x) / size
+        row = int(y) / size
+        if 0 <= column < self.columns and 0 <= row < self.rows and x >= 0 and y >= 0:
+            return row * self.columns + column
+        else:
+            return -1
+
+    def cell_center(self, index):
+        """return C{(x, y)} center of a cell."""
+
+        size = self.cell_size
+        row, column = divmod(index, self.columns)
+        return (column * size + size / 2, row * size + size / 2)
+
+    def rect_cells(self, rect):
+        """return indexes of all cells which rect covers."""
+
+        rect = pygame.Rect(rect)
+        size = self.cell_size
+        left = max(rect.left / size, 0)
+        right = min((rect.right - 1) / size, self.columns - 1)
+        top = max(rect.top / size, 0)
+        bottom = min((rect.bottom - 1) / size, self.rows - 1)
+
+        cells = []
+        for row in range(top, bottom + 1):
+            for column in range(left, right + 1):
+                cells.append(row * self.columns + column)
+        return cells
+
+    def _neighbors(self, index):
+        """return list of C{(neighbor, cost)} legal moves from a cell."""
+
+        columns = self.columns
+        blocked = self.blocked
+        row, column = divmod(index, columns)
+        up = row > 0
+        down = row < self.rows - 1
+        left = column > 0
+        right = column < columns - 1
+
+        moves = []
+        n = index - columns
+        if up and not blocked[n]:
+            moves.append((n, STEP))
+        s = index + columns
+        if down and not blocked[s]:
+            moves.append((s, STEP))
+        w = index - 1
+        if left and not blocked[w]:
+            moves.append((w, STEP))
+        e = index + 1
+        if right and not blocked[e]:
+            moves.append((e, STEP))
+
+        if up and left and not blocked[n] and not blocked[w] and not blocked[n - 1]:
+            moves.append((n - 1, DIAGONAL))
+        if up and right and not blocked[n] and not blocked[e] and not blocked[n + 1]:
+            moves.append((n + 1, DIAGONAL))
+        if down and left and not blocked[s] and not blocked[w] and not blocked[s - 1]:
+            moves.append((s - 1, DIAGONAL))
+        if down and right and not blocked[s] and not blocked[e] and not blocked[s + 1]:
+            moves.append((s + 1, DIAGONAL))
+
+        return moves
+
+    def set_target(self, point):
+        """Find the way to a new target.
+
+        Everything is worked out again, but only if the target moved
+        in to a different cell.
+
+        """
+
+        self.target = point
+        index = self.cell_at(point)
+        if index != self.target_cell:
+            self.target_cell = index
+            self.recompute()
+
+    def recompute(self):
+        """Work out the distances for the whole grid."""
+
+        count = len(self.dist)
+        self.dist = [FAR] * count
+        self.parent = [-1] * count
+        index = self.target_cell
+        if index >= 0 and not self.blocked[index]:
+            self.dist[index] = 0
+            self._spread([(0, index)])
+
+    def _spread(self, heap):
+        """Run Dijkstra's algorithm out from the cells in heap."""
+
+        dist = self.dist
+        parent = self.parent
+        neighbors = self._neighbors
+        updated = 0
+        while heap:
+            d, index = heapq.heappop(heap)
+            if d > dist[index]:
+                continue
+            updated += 1
+            for n, cost in neighbors(index):
+                nd = d + cost
+                if nd < dist[n]:
+                    dist[n] = nd
+                    parent[n] = index
+                    heapq.heappush(heap, (nd, n))
+        self.cells_updated += updated
+
+    def block(self, cells):
+        """Mark cells as blocked and fix the distances.
+
+        Only the cells whose way to the target went through one of
+        the newly blocked cells (or cut past its corner) are worked
+        out again.
+
+        @param cells: List of cell indexes.
+
+        """
+
+        blocked = self.blocked
+        parent = self.parent
+        roots = []
+        for index in cells:
+            if not blocked[index]:
+                blocked[index] = 1
+                roots.append(index)
+        if not roots:
+            return
+
+        # cells whose step towards the target is no longer allowed
+        for index in roots[:]:
+            for n in self._around(index):
+                p = parent[n]
+                if p >= 0 and not blocked[n] and not self._legal(p, n):
+                    roots.append(n)
+
+        # everything downstream of those cells is lost too
+        lost = {}
+        while roots:
+            index = roots.pop()
+            if lost.has_key(index):
+                continue
+            lost[index] = 1
+            for n in self._around(index):
+                if parent[n] == index:
+                    roots.append(n)
+
+        dist = self.dist
+        for index in lost.keys():
+            dist[index] = FAR
+            parent[index] = -1
+
+        # start again from the edge of the lost area
+        heap = []
+        for index in lost.keys():
+            if blocked[index]:
+                continue
+            for n, cost in self._neighbors(index):
+                nd = dist[n] + cost
+                if dist[n] < FAR and nd < dist[index]:
+                    dist[index] = nd
+                    parent[index] = n
+            if dist[index] < FAR:
+                heap.append((dist[index], index))
+        heapq.heapify(heap)
+        self._spread(heap)
+
+    def unblock(self, cells):
+        """Mark cells as open and fix the distances.
+
+        Only the cells which now have a shorter way to the target are
+        worked out again.
+
+        @param cells: List of cell indexes.
+
+        """
+
+        blocked = self.blocked
+        dist = self.dist
+        heap = []
+        for index in cells:
+            if blocked[index]:
+                blocked[index] = 0
+                if index == self.target_cell:
+                    dist[index] = 0
+                    self.parent[index] = -1
+                    heap.append((0, index))
+                for n, cost in self._neighbors(index):
+                    if dist[n] < FAR:
+                        heap.append((dist[n], n))
+        heapq.heapify(heap)
+        self._spread(heap)
+
+    def _around(self, index):
+        """return indexes of the (up to 8) cells touching a cell."""
+
+        row, column = divmod(index, self.columns)
+        cells = []
+        for r in range(max(row - 1, 0), min(row + 2, self.rows)):
+            for c in range(max(column - 1, 0), min(column + 2, self.columns)):
+                n = r * self.columns + c
+                if n != index:
+                    cells.append(n)
+        return cells
+
+    def _legal(self, a, b):
+        """return True if one step from cell a to cell b is allowed."""
+
+        for n, cost in self._neighbors(a):
+            if n == b:
+                return 1
+        return 0
+
+    def block_rect(self, rect):
+        """Block all of the cells under rect."""
+
+        self.block(self.rect_cells(rect))
+
+    def unblock_rect(self, rect):
+        """Open all of the cells under rect."""
+
+        self.unblock(self.rect_cells(rect))
+
+    def get_distance(self, point):
+        """return distance in pixels from point to the target
+        going around blocked cells, or None if there is no way.
+
+        """
+
+        index = self.cell_at(point)
+        if index < 0 or self.dist[index] >= FAR:
+            return None
+        return self.dist[index] * self.cell_size / float(STEP)
+
+    def get_direction(self, point):
+        """return C{(dx, dy)} unit vector of the way to go from point.
+
+        Returns None if there is no way to the target from point, and
+        C{(0, 0)} if point is right on the target.
+
+        """
+
+        index = self.cell_at(point)
+        if index < 0 or self.dist[index] >= FAR:
+            return None
+
+        if index == self.target_cell:
+            x, y = self.target
+        else:
+            x, y = self.cell_center(self.parent[index])
+        dx = x - point[0]
+        dy = y - point[1]
+        d = math.hypot(dx, dy)
+        if not d:
+            return (0, 0)
+        return (dx / d, dy / d)
@@ -37,6 +37,8 @@ import Widget
 import Path
 import Cursor
 import Event
+import Trace
+from Timing import timer
 from locals import BLACK, RED, LBLUE, LGREEN
 
 class GameLooper:
@@ -70,6 +72,8 @@ class GameLooper:
             self.checkEvents()
             dirty = self.sprites.draw()
             pygame.display.update(dirty)
+            if conf.IDLE_WAIT and not self.stop:
+                self.events.wait()
 
         self.stop = 0
         pygame.event.get()
@@ -124,6 +128,27 @@ class GameLooper:
         self.layers.append(layer)
         return layer
 
+    def addCamera(self, rect=None, position=(0, 0), zoom=1, group=None):
+        """return a L{Screen.Camera} drawing the game sprites.
+
+        Call more than once with different C{rect}s for split-screen.
+
+        @param rect: Area of the window to use as the viewport, or
+            None to use the whole window.
+        @param position: World coordinates shown at the top left
+            of the viewport.
+        @param zoom: Screen pixels per world pixel.
+        @param group: L{SpriteGroup} to show. Defaults to the
+            game's C{.sprites}
+
+        """
+
+        if group is None:
+            group = self.sprites
+        camera = Screen.Camera(self.window, rect, position, zoom)
+        group.add_camera(camera)
+        return camera
+
     def _stop(self, arg=None):
         """set the C{.stop} attribute.
 
@@ -323,6 +348,8 @@ class GameConfiguration(Drawable.Layer, GameLooper):
             self.sprites.move()
             self.sprites.draw()
             self.udraw()
+            if conf.IDLE_WAIT and not self.stop and not self.sprites.is_animated():
+                self.events.wait()
 
         self.pause()
         self.stop = 0
@@ -369,6 +396,9 @@ class Game(GameLooper):
 
         self.clock = pygame.time.Clock()
         conf.ticks = 0
+        self.dirty_count = 0
+        self.set_pacing(0)
+        self.set_fixed_step(None)
 
         #pygame.event.set_allowed(None)
 
@@ -530,6 +560,11 @@ class Game(GameLooper):
                 if timeNow - startTime >= timeout:
                     self.stop = 1
             group.check()
+            if conf.IDLE_WAIT and not self.stop:
+                if timeout is not None:
+                    group.wait(timeout - (timeNow - startTime))
+                else:
+                    group.wait()
         self.stop = 0
         
         self.unpause()
@@ -581,6 +616,133 @@ class Game(GameLooper):
 
         self.set_background()
 
+    def set_pacing(self, precise=1):
+        """Choose how to wait between frames.
+
+        Normally the game waits using L{pygame.time.Clock.tick}, which
+        can sleep for longer than it should. With precise pacing, the
+        game sleeps until about 1 millisecond before the next frame is
+        due, then checks the time over and over until it is.
+
+        This uses more processor time, but frames come at a steadier
+        rate.
+
+        @param precise: 1 for precise pacing, 0 for normal.
+
+        """
+
+        self.precise = precise
+        self._frame_due = None
+
+    def set_fixed_step(self, step=10, max_steps=5, max_skip=5, interpolate=0):
+        """Move sprites in steps of a fixed amount of time.
+
+        Normally sprites move once each frame, by however much time
+        went by since the last frame. With a fixed step, C{move()} and
+        C{checkCollisions()} are called with C{conf.ticks} always set
+        to C{step}, as many times as it takes to catch up. This keeps
+        movement and collisions the same however fast the game runs.
+
+        If the game falls behind, drawing is skipped (up to C{max_skip}
+        frames in a row) so that more time goes to moving.
+
+        @param step: Milliseconds per step, or None to go back to one
+            move per frame.
+        @param max_steps: Most steps per frame. If more are needed, the
+            game slows down instead of falling further behind.
+        @param max_skip: Most frames in a row which may go undrawn.
+        @param interpolate: If true, sprites are drawn part way between
+            their last two positions, according to how much of the
+            next step has gone by. Makes movement look smoother when
+            the step is longer than a frame.
+
+        """
+
+        self.fixed_step = step
+        self.max_steps = max_steps
+        self.max_skip = max_skip
+        self.interpolate = interpolate
+        self._step_time = 0
+        self._skipped = 0
+
+    def _tick(self):
+        """Wait until time for the next frame, and set C{conf.ticks}."""
+
+        if not self.precise:
+            conf.ticks = self.clock.tick(conf.MAX_FPS)
+            return
+
+        period = 1.0 / conf.MAX_FPS
+        now = timer()
+        due = self._frame_due
+        if due is None:
+            due = now
+        else:
+            wait = due - now - 0.001
+            if wait > 0:
+                pygame.time.wait(int(wait * 1000))
+            while timer() < due:
+                pass
+            now = timer()
+        if now - due > period:
+            # too far behind to catch up
+            due = now
+        self._frame_due = due + period
+
+        conf.ticks = self.clock.tick()
+
+    def _move_fixed(self):
+        """Make as many fixed size steps as needed to catch up.
+
+        @return: True if the frame should be drawn.
+
+        """
+
+        step = self.fixed_step
+        self._step_time += conf.ticks
+        steps = 0
+        while self._step_time >= step and steps < self.max_steps:
+            conf.ticks = step
+            self.sprites.move()
+            self.checkCollisions()
+            self._step_time -= step
+            steps += 1
+
+        behind = self._step_time >= step
+        if behind:
+            # do not try to make up the rest
+            self._step_time = step - 1
+
+        if behind and self._skipped < self.max_skip:
+            self._skipped += 1
+            return 0
+        self._skipped = 0
+        return 1
+
+    def _draw_interpolated(self):
+        """Draw sprites part way between their last two positions."""
+
+        alpha = float(self._step_time) / self.fixed_step
+        back = 1 - alpha
+        moved = []
+        for level in self.sprites.levels.values():
+            for sprite in level.sprites():
+                path = getattr(sprite, 'path', None)
+                if path is None:
+                    continue
+                x, y = sprite.position
+                xOld, yOld = path.positionOld
+                if x == xOld and y == yOld:
+                    continue
+                rect = sprite.rect
+                moved.append((sprite, rect))
+                sprite.rect = rect.move(int(round((xOld - x) * back)),
+                                        int(round((yOld - y) * back)))
+        dirty = self.sprites.draw()
+        for sprite, rect in moved:
+            sprite.rect = rect
+        return dirty
+
     def mainloop(self, frames=0):
         """The main game loop.
         
@@ -592,17 +754,40 @@ class Game(GameLooper):
         while not self.quit:
             frame = 0
             while not self.quit and not self.stop and (frame < frames or not frames):
-                conf.ticks = self.clock.tick(conf.MAX_FPS)
+                t = Trace.begin()
+                self._tick()
+                frame_start = t = Trace.lap('tick', 'game', t)
                 self.sprites.clear()
+                t = Trace.lap('clear', 'game', t)
                 self.checkEvents()
-                self.sprites.move()
-                self.checkCollisions()
+                t = Trace.lap('checkEvents', 'game', t)
+                if self.fixed_step is None:
+                    self.sprites.move()
+                    t = Trace.lap('move', 'game', t)
+                    self.checkCollisions()
+                    t = Trace.lap('checkCollisions', 'game', t)
+                    render = 1
+                else:
+                    ticks = conf.ticks
+                    render = self._move_fixed()
+                    # layers still move once a frame, by the frame time
+                    conf.ticks = ticks
+                    t = Trace.lap('move', 'game', t)
                 if self.layers:
                     for layer in self.layers:
                         layer.updateContents()
-                dirty = self.sprites.draw()
-                #print 'dirty', dirty
-                pygame.display.update(dirty)
+                    t = Trace.lap('layers', 'game', t)
+                if render:
+                    if self.fixed_step is not None and self.interpolate:
+                        dirty = self._draw_interpolated()
+                    else:
+                        dirty = self.sprites.draw()
+                    self.dirty_count = len(dirty)
+                    t = Trace.lap('draw', 'game', t)
+                    #print 'dirty', dirty
+                    pygame.display.update(dirty)
+                    Trace.lap('display.update', 'game', t)
+                Trace.end_frame(frame_start)
                 #self.update(dirty)
                 frame += 1
 
@@ -624,6 +809,7 @@ class Game(GameLooper):
     def unpause(self):
         GameLooper.unpause(self)
         self.clock.tick()
+        self._frame_due = None
 
 
 class TwistedGame(Game):
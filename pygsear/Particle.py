@@ -0,0 +1,414 @@
+# pygsear
+# Copyright (C) 2003 Lee Harr
+#
+#
+# This file is part of pygsear.
+#
+# pygsear is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pygsear is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pygsear; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Particle effects, such as sparks, smoke and explosions.
+
+"""
+
+import math
+import random
+
+try:
+    import numpy
+    import pygame.surfarray
+except ImportError:
+    numpy = None
+
+import pygame
+
+import conf
+from Drawable import Drawable
+from locals import WHITE, TRANSPARENT, PIx2
+
+
+class Emitter(Drawable):
+    """Sprite which is a whole cloud of particles.
+
+    Particles are not sprites. Their positions, velocities, ages and
+    colors are kept in NumPy arrays, so moving thousands of them is
+    one step for each array instead of one method call per particle.
+    All of the particles are drawn on to the emitter's own image, so
+    a L{Drawable.SpriteGroup} sees only one sprite, with one dirty
+    rect around the whole cloud.
+
+    If C{image} is given, every particle is drawn as a copy of it.
+    Otherwise each particle is one pixel of its own color.
+
+    Without NumPy, the particles are kept in plain lists instead,
+    which works the same but is much slower.
+
+    The emitter's position (and path) is where new particles start.
+
+    Only particles inside the emitter's C{bounds} are drawn, and
+    particles which are outside and can never come back (moving away,
+    with gravity not pulling them back) are thrown away.
+
+    """
+
+    def __init__(self, w=None, capacity=1000, image=None, color=WHITE,
+                    lifetime=(0.5, 1.5), speed=(50, 150),
+                    direction=(0, PIx2), gravity=(0, 0), rate=0,
+                    bounds=None):
+        """Initialize the emitter.
+
+        @param w: Layer on which sprite lives.
+        @param capacity: Most particles which can be alive at once.
+        @param image: L{pygame.Surface} to draw for every particle.
+        @param color: Color of the particles, or a list of colors to
+            choose from at random. Not used if C{image} is given.
+        @param lifetime: C{(min, max)} seconds each particle lasts.
+        @param speed: C{(min, max)} starting speed in pixels per second.
+        @param direction: C{(min, max)} starting direction in radians.
+            0 is towards the right edge of the screen.
+        @param gravity: C{(gx, gy)} constant acceleration.
+        @param rate: Particles made each second by L{move}. With 0,
+            particles are only made by L{emit}.
+        @param bounds: L{pygame.Rect} particles are drawn in. Default
+            is the whole layer. In a scrolling world (see
+            L{Screen.Camera}) use the area the cameras can see.
+
+        """
+
+        Drawable.__init__(self, w)
+        self.capacity = capacity
+        self.particle_image = image
+        if image is not None:
+            self.particle_size = image.get_size()
+        else:
+            self.particle_size = (1, 1)
+        self.set_color(color)
+        self.lifetime = lifetime
+        self.speed = speed
+        self.direction = direction
+        self.gravity = gravity
+        self.rate = rate
+        self._rate_left = 0.0
+        self.set_bounds(bounds)
+
+        self.count = 0
+        if numpy is not None:
+            self.x = numpy.zeros(capacity, numpy.float64)
+            self.y = numpy.zeros(capacity, numpy.float64)
+            self.vx = numpy.zeros(capacity, numpy.float64)
+            self.vy = numpy.zeros(capacity, numpy.float64)
+            self.age = numpy.zeros(capacity, numpy.float64)
+            self.life = numpy.zeros(capacity, numpy.float64)
+            self.colors = numpy.zeros(capacity, numpy.uint32)
+        else:
+            self.particles = []
+
+        self.buffer = None
+        self.image = pygame.Surface((0, 0))
+        self.rect = pygame.Rect(self.position, (0, 0))
+        self.set_crect(self.rect)
+
+    def set_color(self, color):
+        """Set the color (or list of colors) for new particles."""
+
+        if type(color[0]) == type(()) or type(color[0]) == type([]):
+            self.color_choices = color
+        else:
+            self.color_choices = [color]
+        self.mapped = None
+
+    def set_bounds(self, bounds=None):
+        """Set the area particles are drawn in.
+
+        @param bounds: L{pygame.Rect}, or None to use the whole layer.
+
+        """
+
+        if bounds is not None:
+            bounds = pygame.Rect(bounds)
+        self.bounds = bounds
+
+    def get_bounds(self):
+        """return the L{pygame.Rect} particles are drawn in."""
+
+        if self.bounds is not None:
+            return self.bounds
+        return self.screen.get_rect()
+
+    def _set_position(self, location):
+        """Move the place new particles start from.
+
+        The sprite C{rect} is set by L{render}, around the particles.
+
+        """
+
+        x, y = location
+        self.position[0], self.position[1] = x, y
+
+    def _get_buffer(self, width, height):
+        """return a surface at least width x height to draw on.
+
+        The surface grows as needed, but never past the size of the
+        bounds (plus one particle).
+
+        """
+
+        buffer = self.buffer
+        if buffer is None or buffer.get_width() < width or buffer.get_height() < height:
+            if buffer is not None:
+                bounds = self.get_bounds()
+                pw, ph = self.particle_size
+                width = max(width, min(2 * buffer.get_width(), bounds.width + pw))
+                height = max(height, min(2 * buffer.get_height(), bounds.height + ph))
+            buffer = pygame.Surface((width, height)).convert()
+            buffer.set_colorkey(TRANSPARENT)
+            self.buffer = buffer
+        return buffer
+
+    def _get_mapped(self):
+        """return the particle colors mapped to the image pixel format."""
+
+        if self.mapped is None:
+            buffer = self._get_buffer(1, 1)
+            self.mapped = []
+            for color in self.color_choices:
+                self.mapped.append(buffer.map_rgb(color))
+        return self.mapped
+
+    def emit(self, n, position=None):
+        """Make new particles.
+
+        If there is not room for all of them, only as many as will
+        fit are made.
+
+        @param n: Number of particles.
+        @param position: C{(x, y)} where they start. Default is the
+            emitter's position.
+
+        """
+
+        if position is None:
+            position = self.position
+        x0, y0 = position
+        n = min(int(n), self.capacity - self.count)
+        if n <= 0:
+            return
+        mapped = self._get_mapped()
+
+        if numpy is not None:
+            uniform = numpy.random.uniform
+            start = self.count
+            end = start + n
+            angle = uniform(self.direction[0], self.direction[1], n)
+            speed = uniform(self.speed[0], self.speed[1], n)
+            self.x[start:end] = x0
+            self.y[start:end] = y0
+            self.vx[start:end] = speed * numpy.cos(angle)
+            self.vy[start:end] = -speed * numpy.sin(angle)
+            self.age[start:end] = 0
+            self.life[start:end] = uniform(self.lifetime[0], self.lifetime[1], n)
+            choices = numpy.array(mapped, numpy.uint32)
+            self.colors[start:end] = choices[numpy.random.randint(0, len(mapped), n)]
+        else:
+            uniform = random.uniform
+            for i in range(n):
+                angle = uniform(self.direction[0], self.direction[1])
+                speed = uniform(self.speed[0], self.speed[1])
+                self.particles.append([x0, y0,
+                        speed * math.cos(angle), -speed * math.sin(angle),
+                        0, uniform(self.lifetime[0], self.lifetime[1]),
+                        random.choice(mapped)])
+
+        self.count += n
+
+    def move(self):
+        """Move the emitter along its path, make new particles at the
+        emitter's C{rate}, move all of the particles, and throw away
+        the ones which are too old.
+
+        """
+
+        t = min(conf.ticks, conf.MAX_TICK) / 1000.0
+        self._set_position(self.path.next())
+
+        if self.rate:
+            self._rate_left += self.rate * t
+            n = int(self._rate_left)
+            if n:
+                self._rate_left -= n
+                self.emit(n)
+
+        self.step(t)
+        self.render()
+
+    def step(self, t):
+        """Move all of the particles forward t seconds."""
+
+        gx, gy = self.gravity
+        n = self.count
+        if numpy is not None:
+            vx = self.vx[:n]
+            vy = self.vy[:n]
+            if gx:
+                vx += gx * t
+            if gy:
+                vy += gy * t
+            self.x[:n] += vx * t
+            self.y[:n] += vy * t
+            age = self.age[:n]
+            age += t
+
+            alive = age < self.life[:n]
+
+            # off the edge and still heading away, so never coming back
+            bounds = self.get_bounds()
+            pw, ph = self.particle_size
+            x = self.x[:n]
+            y = self.y[:n]
+            if gx <= 0:
+                alive &= ~((x <= bounds.left - pw) & (vx <= 0))
+            if gx >= 0:
+                alive &= ~((x >= bounds.right) & (vx >= 0))
+            if gy <= 0:
+                alive &= ~((y <= bounds.top - ph) & (vy <= 0))
+            if gy >= 0:
+                alive &= ~((y >= bounds.bottom) & (vy >= 0))
+            m = int(alive.sum())
+            if m < n:
+                for a in (self.x, self.y, self.vx, self.vy,
+                            self.age, self.life, self.colors):
+                    a[:m] = a[:n][alive]
+                self.count = m
+        else:
+            bounds = self.get_bounds()
+            pw, ph = self.particle_size
+            left = bounds.left - pw
+            top = bounds.top - ph
+            right = bounds.right
+            bottom = bounds.bottom
+            particles = []
+            for p in self.particles:
+                p[2] += gx * t
+                p[3] += gy * t
+                p[0] += p[2] * t
+                p[1] += p[3] * t
+                p[4] += t
+                if p[4] >= p[5]:
+                    continue
+                if p[0] <= left and p[2] <= 0 and gx <= 0:
+                    continue
+                if p[0] >= right and p[2] >= 0 and gx >= 0:
+                    continue
+                if p[1] <= top and p[3] <= 0 and gy <= 0:
+                    continue
+                if p[1] >= bottom and p[3] >= 0 and gy >= 0:
+                    continue
+                particles.append(p)
+            self.particles = particles
+            self.count = len(particles)
+
+    def render(self):
+        """Draw the particles inside the bounds on to the emitter's
+        image, and set the sprite rect to just cover them.
+
+        """
+
+        bounds = self.get_bounds()
+        pw, ph = self.particle_size
+        n = self.count
+        if numpy is not None:
+            xs = self.x[:n].astype(numpy.int32)
+            ys = self.y[:n].astype(numpy.int32)
+            inside = ((xs > bounds.left - pw) & (xs < bounds.right) &
+                        (ys > bounds.top - ph) & (ys < bounds.bottom))
+            xs = xs[inside]
+            ys = ys[inside]
+            colors = self.colors[:n][inside]
+            n = len(xs)
+        else:
+            xs = []
+            ys = []
+            colors = []
+            for p in self.particles:
+                x = int(p[0])
+                y = int(p[1])
+                if bounds.left - pw < x < bounds.right and bounds.top - ph < y < bounds.bottom:
+                    xs.append(x)
+                    ys.append(y)
+                    colors.append(p[6])
+            n = len(xs)
+
+        if not n:
+            self.image = pygame.Surface((0, 0))
+            self.rect = pygame.Rect(self.position, (0, 0))
+            self.set_crect(self.rect)
+            return
+
+        if numpy is not None:
+            left = int(xs.min())
+            top = int(ys.min())
+            right = int(xs.max())
+            bottom = int(ys.max())
+        else:
+            left = min(xs)
+            top = min(ys)
+            right = max(xs)
+            bottom = max(ys)
+
+        width = right - left + pw
+        height = bottom - top + ph
+        buffer = self._get_buffer(width, height)
+        area = pygame.Rect(0, 0, width, height)
+        buffer.fill(TRANSPARENT, area)
+
+        image = self.particle_image
+        if image is not None:
+            if numpy is not None:
+                xs = (xs - left).tolist()
+                ys = (ys - top).tolist()
+            else:
+                xs = [x - left for x in xs]
+                ys = [y - top for y in ys]
+            if hasattr(buffer, 'blits'):
+                buffer.blits(zip([image] * n, zip(xs, ys)), 0)
+            else:
+                blit = buffer.blit
+                for i in range(n):
+                    blit(image, (xs[i], ys[i]))
+        elif numpy is not None:
+            pixels = pygame.surfarray.pixels2d(buffer)
+            pixels[xs - left, ys - top] = colors
+            del pixels
+        else:
+            set_at = buffer.set_at
+            unmap = buffer.unmap_rgb
+            for i in range(n):
+                set_at((xs[i] - left, ys[i] - top), unmap(colors[i]))
+
+        self.image = buffer.subsurface(area)
+        self.rect = pygame.Rect(left, top, width, height)
+        self.set_crect(self.rect)
+
+    def get_count(self):
+        """return number of particles alive."""
+
+        return self.count
+
+    def kill_particles(self):
+        """Throw away all of the particles."""
+
+        self.count = 0
+        if numpy is None:
+            self.particles = []
+        self.render()
@@ -1336,6 +1336,169 @@ class RandomAccelerationPathBounded(RandomAccelerationPath, VelocityPathBounded)
         return Path.next(self)
 
 
+class FlowPath(PathNG):
+    """Path which finds its way around obstacles using a flow field.
+
+    Many sprites can share one L{Flow.FlowField}, and each one only
+    has to look up which way to go from where it is.
+
+    """
+
+    def __init__(self, field, startLocation=(100, 100), speed=100):
+        """Initialize the path.
+
+        @param field: L{Flow.FlowField} leading to the target.
+        @param startLocation: Initial position.
+        @param speed: Speed in pixels per second.
+
+        """
+
+        self.field = field
+        self.speed = speed
+        PathNG.__init__(self, startLocation)
+
+    def set_field(self, field):
+        """Follow a different flow field."""
+
+        self.field = field
+
+    def next(self, t=None):
+        """return next position along path
+
+        Stops if there is no way to the target, or if the target
+        has been reached.
+
+        """
+
+        direction = self.field.get_direction(self.get_position())
+        if direction is None:
+            dx, dy = 0, 0
+        else:
+            dx, dy = direction
+        if dx or dy:
+            self._direction = math.atan2(-dy, dx)
+        self._set_velocity(self.speed * dx, self.speed * dy)
+
+        return PathNG.next(self, t)
+
+
+class LightPath(object):
+    """Small, fast path with a velocity and an acceleration.
+
+    Uses C{__slots__}, so each path takes much less memory than a
+    L{PathNG} and getting at its attributes is quicker. Meant for
+    L{Drawable.LightSprite}, when there are very many sprites.
+
+    Has the same C{position}, C{positionOld} and movement methods
+    as L{PathNG}, but no restrictions, turning or gravity.
+
+    """
+
+    __slots__ = ('position', 'positionOld', 'startLocation',
+                    'vx', 'vy', 'ax', 'ay', 'directionOld')
+
+    def __init__(self, startLocation=(100, 100), vx=0, vy=0, ax=0, ay=0):
+        """Initialize the path.
+
+        @param startLocation: Initial position.
+        @param vx: horizontal velocity component
+        @param vy: vertical velocity component
+        @param ax: horizontal acceleration component
+        @param ay: vertical acceleration component
+
+        """
+
+        self.startLocation = startLocation
+        self.position = list(startLocation)
+        self.positionOld = list(startLocation)
+        self.vx = vx
+        self.vy = vy
+        self.ax = ax
+        self.ay = ay
+        self.directionOld = 0.0
+
+    def __iter__(self):
+        return self
+
+    def reset(self):
+        """Go back to the start location."""
+
+        self.set_position(self.startLocation)
+
+    def set_position(self, position):
+        """Set position and update positionOld"""
+
+        position_ = self.position
+        self.positionOld[0], self.positionOld[1] = position_[0], position_[1]
+        position_[0], position_[1] = position[0], position[1]
+
+    def get_position(self):
+        """Return position along Path"""
+
+        return self.position[0:2]
+
+    def set_velocity(self, vx=None, vy=None):
+        """Set velocity"""
+
+        if vx is not None:
+            self.vx = vx
+        if vy is not None:
+            self.vy = vy
+
+    def get_velocity(self):
+        """return velocity"""
+
+        return self.vx, self.vy
+
+    def get_speed(self):
+        """return speed"""
+
+        return math.hypot(self.vx, self.vy)
+
+    def get_direction(self):
+        """return direction of travel in radians"""
+
+        if self.vx or self.vy:
+            self.directionOld = math.atan2(-self.vy, self.vx)
+        return self.directionOld
+
+    def set_acceleration(self, ax=None, ay=None):
+        """Set acceleration"""
+
+        if ax is not None:
+            self.ax = ax
+        if ay is not None:
+            self.ay = ay
+
+    def get_acceleration(self):
+        """return acceleration"""
+
+        return self.ax, self.ay
+
+    def next(self, t=None):
+        """return next position along path"""
+
+        if t is None:
+            t = min(conf.ticks, conf.MAX_TICK) / 1000.0
+
+        ax = self.ax
+        ay = self.ay
+        if ax:
+            self.vx += ax * t
+        if ay:
+            self.vy += ay * t
+
+        position = self.position
+        positionOld = self.positionOld
+        x = position[0]
+        y = position[1]
+        positionOld[0] = x
+        positionOld[1] = y
+        position[0] = x + self.vx * t
+        position[1] = y + self.vy * t
+        return position[0:2]
+
+
 class Offset_path(Path):
     """Follow another path, possibly moved over some."""
 
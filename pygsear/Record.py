@@ -0,0 +1,316 @@
+# pygsear
+# Copyright (C) 2003 Lee Harr
+#
+#
+# This file is part of pygsear.
+#
+# pygsear is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pygsear is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pygsear; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Display lists of drawing commands.
+
+A L{DisplayList} keeps a record of lines, circles, filled polygons,
+and images instead of drawing them. It can be replayed later on to
+any surface at any size, or saved as a PNG or SVG file, without
+needing a window.
+
+L{Drawable.Turtle.start_recording} fills a display list from the
+turtle's drawing commands.
+
+"""
+
+import os
+import base64
+import tempfile
+
+import pygame
+import pygame.draw
+from pygame.locals import SRCALPHA
+
+from locals import BLACK
+
+
+class DisplayList:
+    """List of drawing commands which can be replayed.
+
+    Lines drawn end-to-end with the same color and width are kept
+    together as a single polyline, so they can be replayed with one
+    call to L{pygame.draw.lines}. (The corners where the lines join
+    may come out a pixel different from drawing each line by itself.)
+
+    Each command in C{ops} is a tuple starting with its name:
+        - C{('clear', color)}
+        - C{('background', old_color, new_color)}
+        - C{('lines', color, width, points)}
+        - C{('circle', color, center, radius, width)}
+        - C{('polygon', color, points)}
+        - C{('image', surface, position)}
+
+    """
+
+    def __init__(self, size, bgcolor=BLACK):
+        """Initialize the list.
+
+        @param size: C{(width, height)} of the drawing.
+        @param bgcolor: Starting background color.
+
+        """
+
+        self.size = tuple(size)
+        self.bgcolor = bgcolor
+        self.ops = []
+        self._pen = None
+
+    def __len__(self):
+        return len(self.ops)
+
+    def clear(self, color):
+        """Fill the whole drawing with color.
+
+        Everything recorded before is covered up, so it is thrown away.
+
+        """
+
+        self.ops = [('clear', color)]
+        self._pen = None
+
+    def background(self, old_color, new_color):
+        """Change the background color under what has been drawn."""
+
+        self.ops.append(('background', old_color, new_color))
+        self._pen = None
+
+    def line(self, p1, p2, color, width):
+        """Add a line segment.
+
+        If p1 is where the last line ended, and the color and width
+        are the same, the last line is extended instead of
+        starting a new one.
+
+        """
+
+        color = tuple(color)
+        p1 = tuple(p1)
+        p2 = tuple(p2)
+        pen = self._pen
+        if pen is not None and pen[0] == color and pen[1] == width:
+            points = pen[2]
+            if points[-1] == p1:
+                points.append(p2)
+                return
+
+        points = [p1, p2]
+        self.ops.append(('lines', color, width, points))
+        self._pen = (color, width, points)
+
+    def circle(self, color, center, radius, width):
+        """Add a circle, or a filled circle if width is 0."""
+
+        self.ops.append(('circle', tuple(color), tuple(center), radius, width))
+        self._pen = None
+
+    def polygon(self, color, points):
+        """Add a filled polygon."""
+
+        points = [tuple(p) for p in points]
+        self.ops.append(('polygon', tuple(color), points))
+        self._pen = None
+
+    def image(self, surface, position):
+        """Add an image (like rendered text) with its top-left at position."""
+
+        self.ops.append(('image', surface, tuple(position)))
+        self._pen = None
+
+    def mark(self):
+        """return a marker that L{truncate} can go back to."""
+
+        pen = self._pen
+        if pen is not None:
+            return (len(self.ops), len(pen[2]))
+        else:
+            return (len(self.ops), 0)
+
+    def truncate(self, mark):
+        """Throw away everything added since mark was made."""
+
+        nops, npoints = mark
+        del self.ops[nops:]
+        # the ops may have been cleared since the mark was made
+        if npoints and len(self.ops) == nops and self.ops[-1][0] == 'lines':
+            op = self.ops[-1]
+            del op[3][npoints:]
+            self._pen = (op[1], op[2], op[3])
+        else:
+            self._pen = None
+
+    def render(self, surface=None, scale=1):
+        """Draw the commands.
+
+        @param surface: L{pygame.Surface} to draw on, or None to make
+            a new surface (which does not need a window).
+        @param scale: Multiplier for all positions and sizes, so that
+            the drawing can be made at any resolution.
+
+        @return: The surface drawn on.
+
+        """
+
+        if surface is None:
+            w, h = self.size
+            surface = pygame.Surface((int(w * scale), int(h * scale)))
+        surface.fill(self.bgcolor)
+
+        draw_lines = pygame.draw.lines
+        for op in self.ops:
+            kind = op[0]
+            if kind == 'lines':
+                color, width, points = op[1:]
+                if scale != 1:
+                    points = [(x*scale, y*scale) for (x, y) in points]
+                    width = max(1, int(width * scale))
+                draw_lines(surface, color, 0, points, width)
+            elif kind == 'circle':
+                color, (x, y), radius, width = op[1:]
+                radius = int(radius * scale)
+                if width:
+                    width = min(max(1, int(width * scale)), radius)
+                pygame.draw.circle(surface, color,
+                                    (int(x * scale), int(y * scale)),
+                                    radius, width)
+            elif kind == 'polygon':
+                color, points = op[1:]
+                if scale != 1:
+                    points = [(x*scale, y*scale) for (x, y) in points]
+                pygame.draw.polygon(surface, color, points, 0)
+            elif kind == 'image':
+                image, (x, y) = op[1:]
+                if scale != 1:
+                    w, h = image.get_size()
+                    colorkey = image.get_colorkey()
+                    image = pygame.transform.scale(image,
+                                    (int(w * scale), int(h * scale)))
+                    if colorkey is not None:
+                        image.set_colorkey(colorkey)
+                surface.blit(image, (x * scale, y * scale))
+            elif kind == 'clear':
+                surface.fill(op[1])
+            elif kind == 'background':
+                old, new = op[1:]
+                save = surface.copy()
+                save.set_colorkey(old)
+                surface.fill(new)
+                surface.blit(save, (0, 0))
+
+        return surface
+
+    def save(self, filename, scale=1):
+        """Save the drawing to a file.
+
+        @param filename: Name of file. If it ends with C{.svg} the
+            drawing is saved as SVG, otherwise it is rendered and saved
+            by L{pygame.image.save}, which uses the file extension to
+            choose the format.
+        @param scale: Multiplier for all positions and sizes.
+
+        """
+
+        if filename.endswith('.svg'):
+            f = file(filename, 'w')
+            f.write(self.svg(scale))
+            f.close()
+        else:
+            pygame.image.save(self.render(scale=scale), filename)
+
+    def svg(self, scale=1):
+        """return the drawing as an SVG document (a string)."""
+
+        w, h = self.size
+        w = int(w * scale)
+        h = int(h * scale)
+        bgcolor = self.bgcolor
+        elements = []
+        append = elements.append
+        for op in self.ops:
+            kind = op[0]
+            if kind == 'lines':
+                color, width, points = op[1:]
+                append('<polyline points="%s" fill="none" stroke="%s" '
+                        'stroke-width="%s" stroke-linejoin="round" '
+                        'stroke-linecap="round" />' %
+                        (_svg_points(points, scale), _svg_color(color),
+                            width * scale))
+            elif kind == 'circle':
+                color, (x, y), radius, width = op[1:]
+                if width:
+                    paint = 'fill="none" stroke="%s" stroke-width="%s"' % (
+                                _svg_color(color), width * scale)
+                else:
+                    paint = 'fill="%s"' % _svg_color(color)
+                append('<circle cx="%s" cy="%s" r="%s" %s />' %
+                        (x * scale, y * scale, radius * scale, paint))
+            elif kind == 'polygon':
+                color, points = op[1:]
+                append('<polygon points="%s" fill="%s" />' %
+                        (_svg_points(points, scale), _svg_color(color)))
+            elif kind == 'image':
+                image, (x, y) = op[1:]
+                iw, ih = image.get_size()
+                append('<image x="%s" y="%s" width="%s" height="%s" '
+                        'xlink:href="data:image/png;base64,%s" />' %
+                        (x * scale, y * scale, iw * scale, ih * scale,
+                            _png_data(image)))
+            elif kind == 'clear':
+                bgcolor = op[1]
+                elements = []
+                append = elements.append
+            elif kind == 'background':
+                # only exact where nothing was drawn in the old color
+                bgcolor = op[2]
+
+        head = ['<?xml version="1.0" standalone="no"?>',
+                '<svg xmlns="http://www.w3.org/2000/svg" '
+                    'xmlns:xlink="http://www.w3.org/1999/xlink" '
+                    'width="%s" height="%s">' % (w, h),
+                '<rect width="100%%" height="100%%" fill="%s" />' %
+                    _svg_color(bgcolor)]
+        return '\n'.join(head + elements + ['</svg>', ''])
+
+
+def _svg_color(color):
+    return 'rgb(%d,%d,%d)' % tuple(color[:3])
+
+def _svg_points(points, scale):
+    return ' '.join(['%.2f,%.2f' % (x*scale, y*scale) for (x, y) in points])
+
+def _png_data(image):
+    """return image as base64 encoded PNG data."""
+
+    fd, name = tempfile.mkstemp('.png')
+    os.close(fd)
+    try:
+        colorkey = image.get_colorkey()
+        if colorkey is not None:
+            # keep the transparency in the PNG
+            converted = pygame.Surface(image.get_size(), SRCALPHA, 32)
+            converted.fill((0, 0, 0, 0))
+            converted.blit(image, (0, 0))
+            image = converted
+        pygame.image.save(image, name)
+        f = file(name, 'rb')
+        data = f.read()
+        f.close()
+    finally:
+        os.remove(name)
+    return base64.encodestring(data).replace('\n', '')
@@ -28,7 +28,7 @@ import pygame.draw
 from pygame.locals import FULLSCREEN
 
 import conf
-from Util import load_image
+from Util import load_image, save_image
 from locals import WHITE, BLACK
 
 class Layer:
@@ -256,3 +256,371 @@ class Window(Layer):
 
         Layer.border(self, width, color, left, right, top, bottom)
         self.update()
+
+
+def headless():
+    """Set up pygame so that drawing works without a window.
+
+    Images can not be converted until a display mode has been set,
+    so this sets a tiny display mode using SDL's C{dummy} video
+    driver (unless a display mode has already been set).
+
+    Use this before any L{Window} is made. Once the dummy driver is
+    in use, no real window can be opened by this process.
+
+    """
+
+    if pygame.display.get_surface() is not None:
+        return
+
+    if not pygame.display.get_init():
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    pygame.display.set_mode((1, 1), 0, 32)
+
+
+class Offscreen(Layer):
+    """Drawing surface which is never shown on the display.
+
+    An C{Offscreen} can be used anywhere a L{Window} can. Sprites,
+    turtles, and layers draw in to it as usual, but updating the
+    display does nothing. Use L{save} to keep the picture.
+
+    Like a L{Window}, creating an C{Offscreen} makes it the default
+    layer (C{conf.window}) for new sprites.
+
+    """
+
+    def __init__(self, size=None):
+        """Initialize the surfaces.
+
+        @param size: 2-tuple C{(x, y)} dimensions of the surface.
+
+        """
+
+        headless()
+        if size is None:
+            size = conf.WINSIZE
+        Layer.__init__(self, size)
+        self.screen = self._fg
+        self.set_background()
+        conf.window = self
+
+    def resize(self, size):
+        """Change the size, clearing the picture."""
+
+        self.size = size
+        self._fg = pygame.Surface(size)
+        self._bg = pygame.Surface(size)
+        self.screen = self._fg
+        self.rect = self._fg.get_rect()
+        self.set_background()
+
+    def set_title(self, title='pygsear'):
+        """Does nothing. There is no window to put a title on."""
+
+        pass
+
+    def update(self, areas=None):
+        """Does nothing. There is no display to update."""
+
+        pass
+
+    def set_background(self, filename=None, img=None, tilename=None, tile=None, color=None):
+        """Set the background image"""
+
+        Layer.set_background(self, filename, img, tilename, tile, color)
+        self.bg = self._bg
+
+    def save(self, filename, size=None):
+        """Save the picture.
+
+        @param filename: Name of file. The type of file is chosen
+            from the file extension by L{pygame.image.save}.
+        @param size: C{(width, height)} to scale the picture to before
+            saving (for making thumbnails), or None to save at full size.
+
+        """
+
+        save_image(self.screen, filename, size)
+
+
+class Camera:
+    """View of a scrolling world, drawn in to part of the screen.
+
+    With a camera, sprite positions are world coordinates. The
+    camera maps them to the screen only when they are drawn, so
+    scrolling means moving the camera instead of moving every sprite.
+
+    Use L{Drawable.SpriteGroup.add_camera} to draw a group through
+    a camera. More than one camera can show the same group, each
+    in its own part of the screen (split-screen).
+
+    Collision checks do not change, since they compare world
+    coordinates with world coordinates. Use L{to_world} to find
+    where on the world a point on the screen (a mouse click) is.
+
+    @ivar rect: Area of the screen this camera draws in to.
+    @ivar zoom: Screen pixels per world pixel.
+
+    """
+
+    cache_size = 500
+
+    def __init__(self, layer=None, rect=None, position=(0, 0), zoom=1):
+        """Initialize the camera.
+
+        @param layer: L{Layer} to draw in to.
+        @param rect: Area of the layer to use as the viewport, or
+            None to use the whole layer.
+        @param position: World coordinates shown at the top left
+            corner of the viewport.
+        @param zoom: Screen pixels per world pixel.
+
+        """
+
+        if layer is None:
+            layer = conf.window
+        self.layer = layer
+        if rect is None:
+            rect = layer.screen.get_rect()
+        self.rect = pygame.Rect(rect)
+
+        self.position = [0, 0]
+        self.bounds = None
+        self.target = None
+        self.background = None
+        self.drawn = {}
+        self.scale_cache = {}
+        self.zoom = 1
+        self.set_zoom(zoom)
+        self.set_position(position)
+
+    def set_position(self, position):
+        """Scroll so that position is at the top left of the viewport.
+
+        @param position: World coordinates C{(x, y)}.
+
+        """
+
+        x, y = position
+        if self.bounds is not None:
+            w, h = self.get_world_rect().size
+            bounds = self.bounds
+            x = max(bounds.left, min(x, bounds.right - w))
+            y = max(bounds.top, min(y, bounds.bottom - h))
+        self.position[0], self.position[1] = x, y
+
+    def get_position(self):
+        """return world coordinates of the top left of the viewport."""
+
+        return self.position[:]
+
+    def scroll(self, dx=0, dy=0):
+        """Move the camera across the world.
+
+        @param dx: World distance to scroll in the x-direction.
+        @param dy: World distance to scroll in the y-direction.
+
+        """
+
+        x, y = self.position
+        self.set_position((x + dx, y + dy))
+
+    def center_on(self, point):
+        """Scroll so that point is in the center of the viewport.
+
+        @param point: World coordinates C{(x, y)}.
+
+        """
+
+        x, y = point
+        w, h = self.rect.size
+        zoom = float(self.zoom)
+        self.set_position((x - w / zoom / 2, y - h / zoom / 2))
+
+    def follow(self, sprite=None):
+        """Keep sprite in the center of the viewport.
+
+        @param sprite: Sprite to follow, or None to stop following.
+
+        """
+
+        self.target = sprite
+
+    def set_background(self, background=None):
+        """Draw a scrolling background behind the sprites.
+
+        @param background: L{Tile.TileMap} (or anything else with a
+            compatible C{render} method) or None for the plain
+            background of the layer.
+
+        """
+
+        self.background = background
+
+    def update(self):
+        """Scroll to keep up with the sprite being followed, if any."""
+
+        if self.target is not None:
+            x, y = self.target.get_position()
+            w, h = self.target.rect.size
+            self.center_on((x + w / 2.0, y + h / 2.0))
+
+    def set_bounds(self, rect=None):
+        """Keep the camera from scrolling outside of rect.
+
+        @param rect: World area the camera must stay inside of,
+            or None to let the camera go anywhere.
+
+        """
+
+        if rect is None:
+            self.bounds = None
+        else:
+            self.bounds = pygame.Rect(rect)
+        self.set_position(self.position)
+
+    def set_zoom(self, zoom=1):
+        """Change the magnification.
+
+        Scaled images are cached, so they are only made once for
+        each image at each zoom.
+
+        @param zoom: Screen pixels per world pixel. 2 makes everything
+            twice as large.
+
+        """
+
+        if zoom <= 0:
+            raise ValueError, "zoom must be greater than 0"
+        if zoom != self.zoom:
+            self.scale_cache = {}
+        self.zoom = zoom
+
+    def get_world_rect(self):
+        """return the L{pygame.Rect} of the world which is visible."""
+
+        zoom = self.zoom
+        x, y = self.position
+        w, h = self.rect.size
+        return pygame.Rect(int(x), int(y), int(w / zoom) + 1, int(h / zoom) + 1)
+
+    def to_screen(self, point):
+        """Convert world coordinates to screen coordinates."""
+
+        zoom = self.zoom
+        x, y = point
+        ox, oy = self.position
+        return (self.rect.left + (x - ox) * zoom,
+                self.rect.top + (y - oy) * zoom)
+
+    def to_world(self, point):
+        """Convert screen coordinates to world coordinates."""
+
+        zoom = self.zoom
+        x, y = point
+        ox, oy = self.position
+        return ((x - self.rect.left) / float(zoom) + ox,
+                (y - self.rect.top) / float(zoom) + oy)
+
+    def scaled(self, image):
+        """return image scaled for the current zoom.
+
+        @param image: L{pygame.Surface} at world size.
+
+        """
+
+        cache = self.scale_cache
+        key = id(image)
+        if cache.has_key(key):
+            original, scaled = cache[key]
+            if original is image:
+                return scaled
+
+        if len(cache) >= self.cache_size:
+            cache.clear()
+
+        zoom = self.zoom
+        w, h = image.get_size()
+        scaled = pygame.transform.scale(image,
+                            (int(w * zoom + 0.5), int(h * zoom + 0.5)))
+        colorkey = image.get_colorkey()
+        if colorkey is not None:
+            scaled.set_colorkey(colorkey)
+        cache[key] = (image, scaled)
+
+        return scaled
+
+    def draw(self, group, margin=0):
+        """Draw the sprites in group which are visible to this camera.
+
+        @param group: L{Drawable.SpriteGroup} to draw.
+        @param margin: Sprites this far outside of the view are
+            still drawn.
+
+        @return: List of rects, which should be passed to
+            L{pygame.display.update}.
+
+        """
+
+        self.update()
+
+        screen = group.screen
+        surface_blit = screen.blit
+        if self.background is not None:
+            bgdirty = self.background.render(self, group.bg, screen)
+        else:
+            bgdirty = []
+        clip = screen.get_clip()
+        screen.set_clip(self.rect)
+
+        zoom = self.zoom
+        rx, ry = self.rect.topleft
+        ox, oy = self.position
+        view = self.get_world_rect().inflate(2*margin, 2*margin)
+
+        drawn = {}
+        old = self.drawn.get(group, {})
+        dirty = []
+        dirty_append = dirty.append
+        culled = 0
+
+        levels = group.levels.keys()
+        levels.sort()
+        for l in levels:
+            for s in group.levels[l].sprites():
+                rect = s.rect
+                if not view.colliderect(rect):
+                    culled += 1
+                    continue
+                x = int(rx + (rect.left - ox) * zoom)
+                y = int(ry + (rect.top - oy) * zoom)
+                if zoom == 1:
+                    newrect = surface_blit(s.image, (x, y))
+                else:
+                    newrect = surface_blit(self.scaled(s.image), (x, y))
+                if old.has_key(s):
+                    dirty_append(newrect.union(old[s]))
+                    del(old[s])
+                else:
+                    dirty_append(newrect)
+                drawn[s] = newrect
+
+        # places where sprites were, but are not any more
+        dirty.extend(old.values())
+        dirty.extend(bgdirty)
+
+        self.drawn[group] = drawn
+        screen.set_clip(clip)
+        group.culled = culled
+
+        return dirty
+
+    def clear(self, group):
+        """Erase the sprites this camera last drew for group."""
+
+        screen = group.screen
+        bg = group.bg
+        for r in self.drawn.get(group, {}).values():
+            screen.blit(bg, r, r)
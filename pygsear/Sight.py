@@ -0,0 +1,631 @@
+# pygsear
+# Copyright (C) 2003 Lee Harr
+#
+#
+# This file is part of pygsear.
+#
+# pygsear is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pygsear is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pygsear; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Fast line of sight checks against many blocking rects.
+
+"""
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import pygame
+
+import conf
+from Util import line_seg_intersect
+
+
+class LineOfSight:
+    """Set of L{pygame.Rect}s which block the view.
+
+    The rects are kept in a grid, so each sightline is only checked
+    against the rects in the grid cells it passes through. Answers
+    are cached until the rects change, so asking again about the same
+    two points costs only a lookup.
+
+    Many sightlines can be checked at once with L{can_see_list}. If
+    NumPy is available, all of the line-against-rect tests for the
+    whole list are done in one step.
+
+    A sightline is blocked if it crosses either diagonal of a rect,
+    the same as L{Drawable.Drawable.can_see} with a plain list.
+
+    """
+
+    def __init__(self, rects=(), cell_size=64, cache_size=4096):
+        """Initialize the set.
+
+        @param rects: Sequence of L{pygame.Rect}s which block the view.
+        @param cell_size: Width and height of the grid cells.
+        @param cache_size: Maximum number of answers to keep.
+
+        """
+
+        self.cell_size = cell_size
+        self.cache_size = cache_size
+        self.set_rects(rects)
+
+    def set_rects(self, rects):
+        """Replace all of the blocking rects.
+
+        @param rects: Sequence of L{pygame.Rect}s.
+
+        """
+
+        self.rects = []
+        self.cells = {}
+        for rect in rects:
+            self._add(rect)
+        self._changed()
+
+    def add(self, rect):
+        """Add one more blocking rect."""
+
+        self._add(rect)
+        self._changed()
+
+    def remove(self, rect):
+        """Take out a blocking rect."""
+
+        rects = self.rects[:]
+        rects.remove(rect)
+        self.set_rects(rects)
+
+    def _add(self, rect):
+        rect = pygame.Rect(rect)
+        index = len(self.rects)
+        self.rects.append(rect)
+        size = self.cell_size
+        for cx in range(rect.left / size, rect.right / size + 1):
+            for cy in range(rect.top / size, rect.bottom / size + 1):
+                self.cells.setdefault((cx, cy), []).append(index)
+
+    def _changed(self):
+        self.cache = {}
+        self.arrays = None
+        self.edges = None
+
+    def _get_arrays(self):
+        """return the rect corners as NumPy arrays, making them if needed."""
+
+        if self.arrays is None:
+            corners = numpy.zeros((4, len(self.rects)), numpy.int64)
+            for index in range(len(self.rects)):
+                rect = self.rects[index]
+                corners[:, index] = (rect.left, rect.top, rect.right, rect.bottom)
+            self.arrays = corners
+        return self.arrays
+
+    def candidates(self, p1, p2):
+        """return indexes of the rects near the line from p1 to p2.
+
+        Walks the grid one column at a time, looking only at the cells
+        the line passes through in that column.
+
+        """
+
+        size = self.cell_size
+        x1, y1 = p1
+        x2, y2 = p2
+        if x1 > x2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+
+        found = {}
+        cells = self.cells
+        for cx in range(int(x1) / size, int(x2) / size + 1):
+            if x1 == x2:
+                ya, yb = y1, y2
+            else:
+                slope = (y2 - y1) / float(x2 - x1)
+                xa = max(x1, cx * size)
+                xb = min(x2, (cx + 1) * size)
+                ya = y1 + (xa - x1) * slope
+                yb = y1 + (xb - x1) * slope
+            if ya > yb:
+                ya, yb = yb, ya
+            for cy in range(int(ya) / size, int(yb) / size + 1):
+                if cells.has_key((cx, cy)):
+                    for index in cells[(cx, cy)]:
+                        found[index] = 1
+        return found.keys()
+
+    def blocked(self, p1, p2):
+        """return True if the line from p1 to p2 crosses a blocking rect."""
+
+        for index in self.candidates(p1, p2):
+            rect = self.rects[index]
+            if line_seg_intersect(p1, p2, rect.topleft, rect.bottomright):
+                return 1
+            if line_seg_intersect(p1, p2, rect.topright, rect.bottomleft):
+                return 1
+        return 0
+
+    def can_see(self, p1, p2):
+        """return True if nothing blocks the line from p1 to p2.
+
+        @param p1: C{(x, y)} integer coordinates of one end.
+        @param p2: C{(x, y)} integer coordinates of the other end.
+
+        """
+
+        key = (tuple(p1), tuple(p2))
+        cache = self.cache
+        if not cache.has_key(key):
+            if len(cache) >= self.cache_size:
+                cache.clear()
+            cache[key] = not self.blocked(p1, p2)
+        return cache[key]
+
+    def can_see_list(self, lines):
+        """Check many sightlines at once.
+
+        @param lines: List of C{(p1, p2)} pairs of integer points.
+
+        @return: List with True for each line which is clear, and
+            False for each line which is blocked.
+
+        """
+
+        cache = self.cache
+        results = [None] * len(lines)
+        todo = []
+        for n in range(len(lines)):
+            p1, p2 = lines[n]
+            key = (tuple(p1), tuple(p2))
+            if cache.has_key(key):
+                results[n] = cache[key]
+            else:
+                todo.append(n)
+
+        if todo:
+            if numpy is None:
+                for n in todo:
+                    p1, p2 = lines[n]
+                    results[n] = not self.blocked(p1, p2)
+            else:
+                self._can_see_numpy(lines, todo, results)
+
+            if len(cache) + len(todo) > self.cache_size:
+                cache.clear()
+            for n in todo:
+                p1, p2 = lines[n]
+                cache[(tuple(p1), tuple(p2))] = results[n]
+
+        return results
+
+    def _can_see_numpy(self, lines, todo, results):
+        """Fill in results for the lines in todo with one NumPy pass.
+
+        Every (line, nearby rect) pair is laid out in flat arrays, and
+        each line is tested against both diagonals of its rect the same
+        way as L{Util.line_seg_intersect}.
+
+        """
+
+        which = []
+        rect_indexes = []
+        for n in todo:
+            p1, p2 = lines[n]
+            near = self.candidates(p1, p2)
+            which.extend([n] * len(near))
+            rect_indexes.extend(near)
+
+        for n in todo:
+            results[n] = 1
+        if not which:
+            return
+
+        which = numpy.array(which)
+        ends = numpy.array(lines, numpy.int64)[which]
+        x1 = ends[:, 0, 0]
+        y1 = ends[:, 0, 1]
+        x2 = ends[:, 1, 0]
+        y2 = ends[:, 1, 1]
+
+        corners = self._get_arrays()[:, rect_indexes]
+        left, top, right, bottom = corners
+
+        hit = (_cross(x1, y1, x2, y2, left, top, right, bottom) |
+                _cross(x1, y1, x2, y2, right, top, left, bottom))
+        for n in numpy.unique(which[hit]):
+            results[n] = 0
+
+
+    def _get_edges(self):
+        """return the rect edges, making them if needed.
+
+        Parts of edges which are inside other rects can never be
+        seen, so they are cut out. That way no two edges cross, which
+        L{visibility_polygon} depends on.
+
+        @return: List of C{(side, fixed, lo, hi)} where side is
+            C{'top'}, C{'bottom'}, C{'left'} or C{'right'}, fixed is
+            the y (for top and bottom) or x (for left and right) of
+            the edge, and the edge runs from lo to hi along it.
+
+        """
+
+        if self.edges is None:
+            edges = []
+            rects = self.rects
+            size = self.cell_size
+            cells = self.cells
+            for index in range(len(rects)):
+                rect = rects[index]
+                near = {}
+                for cx in range(rect.left / size, rect.right / size + 1):
+                    for cy in range(rect.top / size, rect.bottom / size + 1):
+                        for other in cells.get((cx, cy), ()):
+                            near[other] = 1
+                others = []
+                for other in near.keys():
+                    if other != index and rect.colliderect(rects[other]):
+                        others.append(rects[other])
+
+                left, top, right, bottom = rect.left, rect.top, rect.right, rect.bottom
+                for side, fixed, lo, hi in (('top', top, left, right),
+                                            ('bottom', bottom, left, right),
+                                            ('left', left, top, bottom),
+                                            ('right', right, top, bottom)):
+                    covered = []
+                    for other in others:
+                        if side in ('top', 'bottom'):
+                            if other.top < fixed < other.bottom:
+                                covered.append((other.left, other.right))
+                        elif other.left < fixed < other.right:
+                            covered.append((other.top, other.bottom))
+                    for a, b in _uncovered(lo, hi, covered):
+                        edges.append((side, fixed, a, b))
+            self.edges = edges
+        return self.edges
+
+    def visibility_polygon(self, viewer, bounds=None):
+        """return the area which can be seen from viewer.
+
+        Sweeps once around the viewer. The edges facing the viewer
+        are sorted by the angles of their ends, and a list of the
+        edges crossing the sweep line is kept in order from nearest
+        to farthest. Each time the nearest edge changes, the polygon
+        gets a corner. Takes about M{n log n} steps for n rects.
+
+        @param viewer: C{(x, y)} point looking out.
+        @param bounds: L{pygame.Rect} the view stops at. Default is
+            the whole window.
+
+        @return: List of C{(x, y)} points of the polygon, in order
+            around the viewer, ready for L{pygame.draw.polygon} or
+            L{point_in_polygon}. Empty if viewer is inside or on a
+            corner of a rect, since L{can_see} finds every line from
+            there blocked. A rect which viewer is on the edge of
+            blocks everything on that side.
+
+        """
+
+        if bounds is None:
+            bounds = pygame.Rect((0, 0), conf.WINSIZE)
+        vx, vy = viewer
+        if not (bounds.left <= vx <= bounds.right and
+                    bounds.top <= vy <= bounds.bottom):
+            return []
+        touching = []
+        for rect in self.rects:
+            if not (rect.left <= vx <= rect.right and
+                        rect.top <= vy <= rect.bottom):
+                continue
+            on_x = vx in (rect.left, rect.right)
+            on_y = vy in (rect.top, rect.bottom)
+            if on_x == on_y:
+                # inside, or on a corner (and so on a diagonal)
+                return []
+            touching.append(rect)
+
+        # the edges facing the viewer, cut off at the bounds
+        left, top, right, bottom = bounds.left, bounds.top, bounds.right, bounds.bottom
+        lines = [(left, top, right, top), (right, top, right, bottom),
+                    (right, bottom, left, bottom), (left, bottom, left, top)]
+        for side, fixed, lo, hi in self._get_edges():
+            if side in ('top', 'bottom'):
+                if side == 'top' and not vy < fixed:
+                    continue
+                if side == 'bottom' and not vy > fixed:
+                    continue
+                if not top <= fixed <= bottom:
+                    continue
+                lo = max(lo, left)
+                hi = min(hi, right)
+                if lo < hi:
+                    lines.append((lo, fixed, hi, fixed))
+            else:
+                if side == 'left' and not vx < fixed:
+                    continue
+                if side == 'right' and not vx > fixed:
+                    continue
+                if not left <= fixed <= right:
+                    continue
+                lo = max(lo, top)
+                hi = min(hi, bottom)
+                if lo < hi:
+                    lines.append((fixed, lo, fixed, hi))
+
+        # order each edge so the sweep meets its start first
+        pi = math.pi
+        atan2 = math.atan2
+        segs = []
+        starts = []
+        ends = []
+        wraps = []
+        events = []
+        for x1, y1, x2, y2 in lines:
+            if (x1 - vx) * (y2 - vy) == (y1 - vy) * (x2 - vx):
+                # seen edge on
+                continue
+            a1 = atan2(y1 - vy, x1 - vx)
+            a2 = atan2(y2 - vy, x2 - vx)
+            turn = a2 - a1
+            if turn > pi:
+                turn -= 2 * pi
+            elif turn <= -pi:
+                turn += 2 * pi
+            if turn < 0:
+                x1, y1, x2, y2 = x2, y2, x1, y1
+                a1, a2 = a2, a1
+            seg = len(segs)
+            segs.append((x1, y1, x2, y2))
+            starts.append(a1)
+            ends.append(a2)
+            wraps.append(a2 < a1)
+            events.append((a1, 1, seg))
+            events.append((a2, 0, seg))
+
+        # a rect the viewer is on the edge of blocks the whole side
+        # it is on. The empty edge at the viewer is always nearest.
+        for rect in touching:
+            dx = (vx == rect.left) - (vx == rect.right)
+            dy = (vy == rect.top) - (vy == rect.bottom)
+            middle = atan2(dy, dx)
+            a1 = middle - pi / 2
+            a2 = middle + pi / 2
+            if a1 < -pi:
+                a1 += 2 * pi
+            if a2 > pi:
+                a2 -= 2 * pi
+            seg = len(segs)
+            segs.append((vx, vy, vx, vy))
+            starts.append(a1)
+            ends.append(a2)
+            wraps.append(a2 < a1)
+            events.append((a1, 1, seg))
+            events.append((a2, 0, seg))
+        events.sort()
+
+        def span(seg, angle):
+            # range of angles the edge covers, around angle
+            start, end = starts[seg], ends[seg]
+            if wraps[seg]:
+                if angle >= start:
+                    end += 2 * pi
+                else:
+                    start -= 2 * pi
+            return start, end
+
+        def in_front(seg, other, angle):
+            # edges do not cross, so compare them where both are seen
+            start, end = span(seg, angle)
+            ostart, oend = span(other, angle)
+            middle = (max(start, ostart) + min(end, oend)) / 2.0
+            return (_depth(segs[seg], vx, vy, middle) <
+                        _depth(segs[other], vx, vy, middle))
+
+        def insert(seg, angle):
+            lo = 0
+            hi = len(active)
+            while lo < hi:
+                mid = (lo + hi) / 2
+                if in_front(seg, active[mid], angle):
+                    hi = mid
+                else:
+                    lo = mid + 1
+            active.insert(lo, seg)
+
+        def hit(seg, angle):
+            x1, y1, x2, y2 = segs[seg]
+            if angle == starts[seg]:
+                return (x1, y1)
+            elif angle == ends[seg]:
+                return (x2, y2)
+            t = _depth(segs[seg], vx, vy, angle)
+            return (vx + t * math.cos(angle), vy + t * math.sin(angle))
+
+        # edges which cross the start of the sweep (straight left)
+        active = []
+        for seg in range(len(segs)):
+            if wraps[seg]:
+                insert(seg, -pi)
+
+        polygon = []
+        i = 0
+        n = len(events)
+        while i < n:
+            angle = events[i][0]
+            if active:
+                nearest = active[0]
+            else:
+                nearest = None
+            while i < n and events[i][0] == angle:
+                angle, starting, seg = events[i]
+                if starting:
+                    insert(seg, angle)
+                else:
+                    active.remove(seg)
+                i += 1
+            if active:
+                now_nearest = active[0]
+            else:
+                now_nearest = None
+            if now_nearest != nearest:
+                for seg in (nearest, now_nearest):
+                    if seg is None:
+                        # nothing to see (viewer is on the bounds)
+                        point = (vx, vy)
+                    else:
+                        point = hit(seg, angle)
+                    if not polygon or point != polygon[-1]:
+                        polygon.append(point)
+
+        if len(polygon) > 1 and polygon[0] == polygon[-1]:
+            del polygon[-1]
+        return polygon
+
+    def visible_points(self, viewer, points, bounds=None):
+        """Check which of many points can be seen from viewer.
+
+        Finds the L{visibility_polygon} once, then checks all of the
+        points against it.
+
+        @param viewer: C{(x, y)} point looking out.
+        @param points: List of C{(x, y)} points to check.
+        @param bounds: L{pygame.Rect} the view stops at.
+
+        @return: List with True for each point which can be seen.
+
+        """
+
+        polygon = self.visibility_polygon(viewer, bounds)
+        return points_in_polygon(points, polygon)
+
+
+def point_in_polygon(point, polygon):
+    """return True if point is inside polygon.
+
+    @param point: C{(x, y)} point.
+    @param polygon: List of C{(x, y)} corners.
+
+    """
+
+    x, y = point
+    inside = 0
+    n = len(polygon)
+    j = n - 1
+    for i in range(n):
+        xi, yi = polygon[i]
+        xj, yj = polygon[j]
+        if (yi > y) != (yj > y):
+            if x < xi + (y - yi) * (xj - xi) / float(yj - yi):
+                inside = not inside
+        j = i
+    return inside
+
+
+def points_in_polygon(points, polygon):
+    """Check many points against one polygon.
+
+    Uses NumPy if it is available, so each side of the polygon is
+    checked against all of the points in one step.
+
+    @param points: List of C{(x, y)} points.
+    @param polygon: List of C{(x, y)} corners.
+
+    @return: List with True for each point inside.
+
+    """
+
+    if not points:
+        return []
+    if numpy is None:
+        results = []
+        for point in points:
+            results.append(point_in_polygon(point, polygon))
+        return results
+
+    points = numpy.array(points, numpy.float64)
+    x = points[:, 0]
+    y = points[:, 1]
+    inside = numpy.zeros(len(points), numpy.bool_)
+    n = len(polygon)
+    j = n - 1
+    for i in range(n):
+        xi, yi = polygon[i]
+        xj, yj = polygon[j]
+        if yi != yj:
+            spans = (yi > y) != (yj > y)
+            crosses = x < xi + (y - yi) * (xj - xi) / float(yj - yi)
+            inside ^= spans & crosses
+        j = i
+    return inside.tolist()
+
+
+def _uncovered(lo, hi, covered):
+    """return the parts of lo to hi not in any of the covered ranges."""
+
+    covered.sort()
+    parts = []
+    pos = lo
+    for a, b in covered:
+        if a > pos:
+            parts.append((pos, min(a, hi)))
+        pos = max(pos, b)
+        if pos >= hi:
+            break
+    if pos < hi:
+        parts.append((pos, hi))
+    return parts
+
+
+def _depth(seg, vx, vy, angle):
+    """return distance from (vx, vy) along the ray at angle to the
+    line through seg.
+
+    """
+
+    x1, y1, x2, y2 = seg
+    dx = math.cos(angle)
+    dy = math.sin(angle)
+    ex = x2 - x1
+    ey = y2 - y1
+    denominator = dx * ey - dy * ex
+    if not denominator:
+        return min(math.hypot(x1 - vx, y1 - vy), math.hypot(x2 - vx, y2 - vy))
+    return ((x1 - vx) * ey - (y1 - vy) * ex) / denominator
+
+
+def _cross(x1, y1, x2, y2, x3, y3, x4, y4):
+    """return array of True where segment 1-2 meets segment 3-4.
+
+    Like L{Util.line_seg_intersect}, touching counts as meeting.
+
+    """
+
+    a1 = y2 - y1
+    b1 = x1 - x2
+    c1 = x2 * y1 - x1 * y2
+    r3 = a1 * x3 + b1 * y3 + c1
+    r4 = a1 * x4 + b1 * y4 + c1
+
+    a2 = y4 - y3
+    b2 = x3 - x4
+    c2 = x4 * y3 - x3 * y4
+    r1 = a2 * x1 + b2 * y1 + c2
+    r2 = a2 * x2 + b2 * y2 + c2
+
+    sign = numpy.sign
+    return (sign(r3) * sign(r4) <= 0) & (sign(r1) * sign(r2) <= 0)
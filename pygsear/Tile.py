@@ -0,0 +1,328 @@
+# pygsear
+# Copyright (C) 2003 Lee Harr
+#
+#
+# This file is part of pygsear.
+#
+# pygsear is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pygsear is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pygsear; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Tile maps for levels larger than the screen.
+
+"""
+
+import array
+
+import pygame
+
+import conf
+import Util
+from locals import BLACK
+
+
+class TileMap:
+    """Grid of tiles drawn as the scrolling background of a L{Screen.Camera}.
+
+    The map is kept as a compact array of tile numbers. Square
+    chunks of the map are drawn on to their own surfaces the first
+    time they are needed, and kept in a cache. The least recently
+    used chunks are thrown out when the cache fills up.
+
+    When the camera scrolls, only the chunks which can be seen get
+    blitted. When it does not move, nothing is drawn at all.
+
+    Tile number C{n} is drawn with C{tiles[n]}. If C{tiles[n]} is
+    None, that tile is left empty (filled with the C{bgcolor}).
+
+    """
+
+    def __init__(self, tiles, rows=None, size=None, chunk_size=8,
+                    cache_size=64, bgcolor=BLACK, solid=()):
+        """Initialize the map.
+
+        @param tiles: List of L{pygame.Surface}s, all the same size.
+            L{Util.load_sheet} is a handy way to get these.
+        @param rows: List of rows of tile numbers, for instance from
+            L{Util.load_map}.
+        @param size: C{(columns, rows)} for a new map with all tiles 0.
+            Used only if C{rows} is None.
+        @param chunk_size: Number of tiles across (and down) each chunk.
+        @param cache_size: Maximum number of chunks kept drawn.
+        @param bgcolor: Color behind empty tiles, and outside the map.
+        @param solid: Sequence of tile numbers which are solid.
+
+        """
+
+        self.tiles = tiles
+        for tile in tiles:
+            if tile is not None:
+                self.tile_size = tile.get_size()
+                break
+        else:
+            raise TypeError, "need at least one tile"
+
+        if rows is not None:
+            self.size = (len(rows[0]), len(rows))
+            data = []
+            for row in rows:
+                data.extend(row)
+        elif size is not None:
+            self.size = tuple(size)
+            data = [0] * (size[0] * size[1])
+        else:
+            raise TypeError, "must give rows or size"
+        self.data = array.array('H', data)
+
+        self.chunk_size = chunk_size
+        self.cache_size = cache_size
+        self.bgcolor = bgcolor
+
+        tw, th = self.tile_size
+        cols, nrows = self.size
+        self.rect = pygame.Rect(0, 0, cols * tw, nrows * th)
+        self.chunk_pixels = (chunk_size * tw, chunk_size * th)
+
+        self.chunks = {}
+        self.lru = []
+        self.chunks_drawn = 0
+        self.rendered = {}
+
+        self.set_solid(solid)
+
+    def get_tile(self, col, row):
+        """return tile number at column and row."""
+
+        return self.data[row * self.size[0] + col]
+
+    def set_tile(self, col, row, n):
+        """Change the tile at column and row.
+
+        @param n: New tile number.
+
+        """
+
+        self.data[row * self.size[0] + col] = n
+        key = (col / self.chunk_size, row / self.chunk_size)
+        if self.chunks.has_key(key):
+            del(self.chunks[key])
+            self.lru.remove(key)
+        self.rendered = {}
+
+    def tile_at(self, point):
+        """return C{(column, row)} of the tile under a world point."""
+
+        tw, th = self.tile_size
+        x, y = point
+        return (int(x) / tw, int(y) / th)
+
+    def set_solid(self, solid=()):
+        """Set which tile numbers are solid.
+
+        @param solid: Sequence of tile numbers.
+
+        """
+
+        flags = [0] * len(self.tiles)
+        for n in solid:
+            if n >= len(flags):
+                flags.extend([0] * (n + 1 - len(flags)))
+            flags[n] = 1
+        self.solid_flags = flags
+
+    def is_solid(self, col, row):
+        """return True if the tile at column and row is solid.
+
+        Places outside of the map are not solid.
+
+        """
+
+        cols, rows = self.size
+        if not (0 <= col < cols and 0 <= row < rows):
+            return 0
+        n = self.data[row * cols + col]
+        flags = self.solid_flags
+        return n < len(flags) and flags[n]
+
+    def solid_at(self, point):
+        """return True if the tile under a world point is solid."""
+
+        col, row = self.tile_at(point)
+        return self.is_solid(col, row)
+
+    def _tile_range(self, rect):
+        """return columns and rows of the tiles under rect, clipped to the map."""
+
+        tw, th = self.tile_size
+        cols, rows = self.size
+        c0 = max(0, rect.left / tw)
+        c1 = min(cols - 1, (rect.right - 1) / tw)
+        r0 = max(0, rect.top / th)
+        r1 = min(rows - 1, (rect.bottom - 1) / th)
+        return c0, c1, r0, r1
+
+    def collide_rect(self, rect):
+        """return True if rect overlaps any solid tile.
+
+        Only the tiles under the rect are checked, so this is cheap
+        no matter how large the map is.
+
+        @param rect: L{pygame.Rect} in world coordinates, like a
+            sprite C{crect}.
+
+        """
+
+        c0, c1, r0, r1 = self._tile_range(rect)
+        data = self.data
+        flags = self.solid_flags
+        nflags = len(flags)
+        cols = self.size[0]
+        for row in range(r0, r1 + 1):
+            base = row * cols
+            for col in range(c0, c1 + 1):
+                n = data[base + col]
+                if n < nflags and flags[n]:
+                    return 1
+        return 0
+
+    def collide(self, sprite):
+        """return True if sprite overlaps any solid tile."""
+
+        return self.collide_rect(sprite.crect)
+
+    def solid_rects(self, rect):
+        """return list of L{pygame.Rect}s of solid tiles overlapping rect.
+
+        These can be used anywhere a list of blocking rects is
+        wanted, such as L{Drawable.Drawable.can_see}.
+
+        """
+
+        tw, th = self.tile_size
+        c0, c1, r0, r1 = self._tile_range(rect)
+        data = self.data
+        flags = self.solid_flags
+        nflags = len(flags)
+        cols = self.size[0]
+        rects = []
+        for row in range(r0, r1 + 1):
+            base = row * cols
+            for col in range(c0, c1 + 1):
+                n = data[base + col]
+                if n < nflags and flags[n]:
+                    rects.append(pygame.Rect(col * tw, row * th, tw, th))
+        return rects
+
+    def draw_chunk(self, cx, cy):
+        """return a new surface with one chunk of the map drawn on it."""
+
+        tw, th = self.tile_size
+        cw, ch = self.chunk_pixels
+        size = self.chunk_size
+        cols, rows = self.size
+        tiles = self.tiles
+        ntiles = len(tiles)
+        data = self.data
+
+        chunk = pygame.Surface((cw, ch))
+        try:
+            chunk = chunk.convert()
+        except pygame.error:
+            # no display mode set yet
+            pass
+        chunk.fill(self.bgcolor)
+
+        c0 = cx * size
+        r0 = cy * size
+        for row in range(r0, min(r0 + size, rows)):
+            base = row * cols
+            y = (row - r0) * th
+            for col in range(c0, min(c0 + size, cols)):
+                n = data[base + col]
+                if n < ntiles:
+                    tile = tiles[n]
+                    if tile is not None:
+                        chunk.blit(tile, ((col - c0) * tw, y))
+
+        self.chunks_drawn += 1
+        return chunk
+
+    def get_chunk(self, cx, cy):
+        """return the surface for one chunk, from the cache if possible."""
+
+        key = (cx, cy)
+        chunks = self.chunks
+        lru = self.lru
+        if chunks.has_key(key):
+            if lru[-1] != key:
+                lru.remove(key)
+                lru.append(key)
+            return chunks[key]
+
+        chunk = self.draw_chunk(cx, cy)
+        chunks[key] = chunk
+        lru.append(key)
+        if len(lru) > self.cache_size:
+            del(chunks[lru.pop(0)])
+        return chunk
+
+    def render(self, camera, bg, screen):
+        """Draw the part of the map seen by camera.
+
+        The chunks are drawn on to the background, and then copied
+        to the screen. If the camera has not moved since the last
+        call, nothing is drawn.
+
+        @param camera: L{Screen.Camera} looking at the map.
+        @param bg: Background L{pygame.Surface} of the camera's layer.
+        @param screen: Foreground L{pygame.Surface} of the camera's layer.
+
+        @return: List of rects, which should be passed to
+            L{pygame.display.update}.
+
+        """
+
+        x, y = camera.position
+        key = (int(x), int(y), camera.zoom, tuple(camera.rect))
+        if self.rendered.get(camera) == key:
+            return []
+        self.rendered[camera] = key
+
+        crect = camera.rect
+        clip = bg.get_clip()
+        bg.set_clip(crect)
+        bg.fill(self.bgcolor, crect)
+
+        zoom = camera.zoom
+        rx, ry = crect.topleft
+        ox, oy = int(x), int(y)
+        cw, ch = self.chunk_pixels
+        view = camera.get_world_rect().clip(self.rect)
+        if view.w and view.h:
+            cx0 = view.left / cw
+            cx1 = (view.right - 1) / cw
+            cy0 = view.top / ch
+            cy1 = (view.bottom - 1) / ch
+            for cy in range(cy0, cy1 + 1):
+                sy = int(ry + (cy * ch - oy) * zoom)
+                for cx in range(cx0, cx1 + 1):
+                    sx = int(rx + (cx * cw - ox) * zoom)
+                    chunk = self.get_chunk(cx, cy)
+                    if zoom != 1:
+                        chunk = camera.scaled(chunk)
+                    bg.blit(chunk, (sx, sy))
+
+        bg.set_clip(clip)
+        screen.blit(bg, crect, crect)
+
+        return [pygame.Rect(crect)]
@@ -0,0 +1,215 @@
+# pygsear
+# Copyright (C) 2003 Lee Harr
+#
+#
+# This file is part of pygsear.
+#
+# pygsear is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pygsear is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pygsear; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Find out which kinds of sprites take the most time.
+
+Timing is off until L{enable} is called. Then L{Drawable.SpriteGroup}
+times each sprite's C{move()} and C{draw} separately, and adds the
+time to the sprite's class. L{Drawable.Layer.updateContents} is timed
+as a whole.
+
+Other methods can be timed with L{watch}, for instance::
+
+    Timing.enable()
+    Timing.watch(Drawable.RotatedImage, 'set_closest')
+    Timing.watch(Drawable.Drawable, 'set_position')
+    Timing.dump_at_exit()
+
+Times are given for the class of the sprite (so a C{Wing} which is
+a C{RotatedImage} shows up as C{Wing.set_closest}) and include the
+time spent in any other methods called from that method.
+
+"""
+
+import sys
+import time
+import atexit
+
+
+if sys.platform == 'win32':
+    timer = time.clock
+else:
+    timer = time.time
+
+enabled = 0
+
+# 'Class.method' -> [calls, seconds]
+stats = {}
+
+# (class, name, original) for each watched method
+watched = []
+
+# keys which are being timed right now
+active = {}
+
+_dump_registered = 0
+_dump_filename = None
+
+
+def enable(on=1):
+    """Turn timing on (or off, with C{on=0})."""
+
+    global enabled
+    enabled = on
+
+def disable():
+    """Turn timing off. The times so far are kept."""
+
+    enable(0)
+
+def reset():
+    """Throw away all of the times so far."""
+
+    stats.clear()
+
+def record(key, seconds, calls=1):
+    """Add time to a key.
+
+    @param key: Name to add the time to, usually C{'Class.method'}.
+    @param seconds: Time taken.
+    @param calls: Number of calls which took that time.
+
+    """
+
+    if stats.has_key(key):
+        entry = stats[key]
+        entry[0] += calls
+        entry[1] += seconds
+    else:
+        stats[key] = [calls, seconds]
+
+def call(sprite, name):
+    """Call a method of sprite with no arguments, and time it."""
+
+    start = timer()
+    getattr(sprite, name)()
+    record(sprite.__class__.__name__ + '.' + name, timer() - start)
+
+def watch(cls, name):
+    """Time a method every time it is called (while timing is on).
+
+    @param cls: Class which has the method.
+    @param name: Name of the method.
+
+    """
+
+    for c, n, o in watched:
+        if c is cls and n == name:
+            return
+
+    if cls.__dict__.has_key(name):
+        original = cls.__dict__[name]
+        function = original
+    else:
+        original = None
+        function = getattr(cls, name).im_func
+
+    def timed(self, *args, **kw):
+        if not enabled:
+            return function(self, *args, **kw)
+        key = self.__class__.__name__ + '.' + name
+        if active.has_key(key):
+            # already counted by an outer call (a subclass method
+            # calling the method it overrides, for instance)
+            return function(self, *args, **kw)
+        active[key] = 1
+        start = timer()
+        try:
+            return function(self, *args, **kw)
+        finally:
+            record(key, timer() - start)
+            del active[key]
+
+    timed.__doc__ = function.__doc__
+    setattr(cls, name, timed)
+    watched.append((cls, name, original))
+
+def unwatch_all():
+    """Stop timing all of the methods passed to L{watch}."""
+
+    while watched:
+        cls, name, original = watched.pop()
+        if original is None:
+            delattr(cls, name)
+        else:
+            setattr(cls, name, original)
+
+def get_stats():
+    """return list of C{(key, calls, seconds, average)}, most time first."""
+
+    results = []
+    for key, (calls, seconds) in stats.items():
+        results.append((seconds, key, calls))
+    results.sort()
+    results.reverse()
+
+    report = []
+    for seconds, key, calls in results:
+        report.append((key, calls, seconds, seconds / calls))
+    return report
+
+def get_time(key):
+    """return total seconds recorded for key."""
+
+    if stats.has_key(key):
+        return stats[key][1]
+    return 0
+
+def report(f=None, limit=None):
+    """Write a table of the times.
+
+    @param f: File to write to. Default is C{sys.stdout}.
+    @param limit: Most lines to write.
+
+    """
+
+    if f is None:
+        f = sys.stdout
+
+    lines = get_stats()
+    if limit is not None:
+        lines = lines[:limit]
+
+    f.write('%-40s %10s %10s %10s\n' % ('', 'calls', 'total (s)', 'each (ms)'))
+    for key, calls, seconds, average in lines:
+        f.write('%-40s %10d %10.3f %10.4f\n' % (key, calls, seconds, average * 1000))
+
+def dump_at_exit(filename=None):
+    """Write the L{report} when the program ends.
+
+    @param filename: File to write to. Default is C{sys.stdout}.
+
+    """
+
+    global _dump_registered, _dump_filename
+    _dump_filename = filename
+    if not _dump_registered:
+        atexit.register(_dump)
+        _dump_registered = 1
+
+def _dump():
+    if not stats:
+        return
+    if _dump_filename is None:
+        report()
+    else:
+        f = file(_dump_filename, 'w')
+        report(f)
+        f.close()
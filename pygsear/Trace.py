@@ -0,0 +1,264 @@
+# pygsear
+# Copyright (C) 2003 Lee Harr
+#
+#
+# This file is part of pygsear.
+#
+# pygsear is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# pygsear is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with pygsear; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+"""Timelines of what happened in each frame.
+
+Once tracing is started, the game loop, event callbacks, modal
+widget loops and file loading record spans of time in a ring
+buffer. The buffer can be written out (L{flush}) in the Chrome
+C{trace_event} format, and looked at in a trace viewer such as
+C{chrome://tracing} or Perfetto.
+
+When a C{slow_frame} time is given, any frame which takes longer
+than that is flushed to its own file straight away, so a hitch can
+be looked at along with the frames just before it::
+
+    Trace.start(slow_frame=50)
+
+Each recording call does nothing (and costs very little) while
+tracing is off.
+
+"""
+
+import os
+import re
+
+from Timing import timer
+
+
+enabled = 0
+size = 10000
+slow_time = None
+slow_filename = 'pygsear-slow-%d.json'
+max_slow_flushes = 10
+slow_flushes = 0
+frame_count = 0
+
+_buffer = []
+_next = 0
+_origin = timer()
+
+# characters which must be escaped in a JSON string
+_escape = re.compile(r'[\x00-\x1f"\\]')
+
+
+def start(buffer_size=10000, slow_frame=None, filename='pygsear-slow-%d.json',
+            max_flushes=10):
+    """Start recording.
+
+    @param buffer_size: Most spans to keep. Once full, the oldest
+        spans are thrown away.
+    @param slow_frame: Time in milliseconds. Frames which take longer
+        than this are flushed right away.
+    @param filename: File name for slow frame flushes. A C{%d} in
+        the name is filled in with the frame number.
+    @param max_flushes: Most slow frame flushes to write.
+
+    """
+
+    global enabled, size, slow_time, slow_filename
+    global max_slow_flushes, slow_flushes
+    size = buffer_size
+    slow_time = slow_frame
+    slow_filename = filename
+    max_slow_flushes = max_flushes
+    slow_flushes = 0
+    clear()
+    enabled = 1
+
+def stop():
+    """Stop recording. What was recorded is kept until L{flush}."""
+
+    global enabled
+    enabled = 0
+
+def clear():
+    """Throw away everything recorded so far."""
+
+    global _buffer, _next
+    _buffer = []
+    _next = 0
+
+def _add(record):
+    global _next
+    if len(_buffer) < size:
+        _buffer.append(record)
+    else:
+        _buffer[_next] = record
+        _next = (_next + 1) % size
+
+def begin():
+    """return start time for a span, or None if tracing is off."""
+
+    if enabled:
+        return timer()
+    return None
+
+def end(name, cat, start, args=None):
+    """Record a span from start until now.
+
+    @param name: Name shown for the span.
+    @param cat: Category, such as C{'game'} or C{'load'}.
+    @param start: Time from L{begin}. If None, nothing is recorded.
+    @param args: Dictionary of extra things to show with the span.
+
+    """
+
+    if start is not None and enabled:
+        _add(('X', name, cat, start, timer() - start, args))
+
+def lap(name, cat, start):
+    """Record a span from start until now, and return now as the
+    start of the next span (or None if tracing is off).
+
+    """
+
+    if start is None or not enabled:
+        return None
+    now = timer()
+    _add(('X', name, cat, start, now - start, None))
+    return now
+
+def instant(name, cat, args=None):
+    """Record a moment in time."""
+
+    if enabled:
+        _add(('i', name, cat, timer(), 0, args))
+
+def call(name, cat, function, *args, **kw):
+    """Call function, recording the time it takes as a span."""
+
+    if not enabled:
+        return function(*args, **kw)
+    start = timer()
+    try:
+        return function(*args, **kw)
+    finally:
+        _add(('X', name, cat, start, timer() - start, None))
+
+def traced(function, cat):
+    """return a version of function which records a span each time
+    it is called. If the first argument is a string (like a file
+    name) it is shown with the span.
+
+    """
+
+    name = function.__name__
+
+    def wrapper(*args, **kw):
+        if not enabled:
+            return function(*args, **kw)
+        if args and type(args[0]) == type(''):
+            info = {'file': args[0]}
+        else:
+            info = None
+        start = timer()
+        try:
+            return function(*args, **kw)
+        finally:
+            _add(('X', name, cat, start, timer() - start, info))
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = function.__doc__
+    return wrapper
+
+def end_frame(start):
+    """Record a whole frame, from start until now.
+
+    If the frame took longer than the C{slow_frame} time given to L{start},
+    everything in the buffer is flushed to a file.
+
+    """
+
+    global frame_count, slow_flushes
+    if start is None or not enabled:
+        return
+    frame_count += 1
+    duration = timer() - start
+    _add(('X', 'frame', 'frame', start, duration, {'frame': frame_count}))
+
+    if (slow_time is not None and duration * 1000 > slow_time and
+            slow_flushes < max_slow_flushes):
+        slow_flushes += 1
+        if slow_filename.find('%d') >= 0:
+            flush(slow_filename % frame_count)
+        else:
+            flush(slow_filename)
+
+def get_events():
+    """return list of recorded spans, oldest first."""
+
+    return _buffer[_next:] + _buffer[:_next]
+
+def flush(filename='pygsear-trace.json'):
+    """Write everything recorded to a file, then clear the buffer.
+
+    @param filename: Name of the file to write, in the Chrome
+        C{trace_event} JSON format.
+
+    """
+
+    pid = os.getpid()
+    lines = []
+    for ph, name, cat, start, duration, args in get_events():
+        fields = ['"name": %s' % _json(name),
+                    '"cat": %s' % _json(cat),
+                    '"ph": "%s"' % ph,
+                    '"ts": %.1f' % ((start - _origin) * 1000000),
+                    '"pid": %d' % pid,
+                    '"tid": 1']
+        if ph == 'X':
+            fields.append('"dur": %.1f' % (duration * 1000000))
+        else:
+            fields.append('"s": "t"')
+        if args:
+            fields.append('"args": %s' % _json(args))
+        lines.append('{' + ', '.join(fields) + '}')
+
+    f = file(filename, 'w')
+    f.write('{"traceEvents": [\n')
+    f.write(',\n'.join(lines))
+    f.write('\n], "displayTimeUnit": "ms"}\n')
+    f.close()
+
+    clear()
+
+def _json(value):
+    """return value written as JSON."""
+
+    t = type(value)
+    if t == type({}):
+        items = []
+        for key, v in value.items():
+            items.append('%s: %s' % (_json(str(key)), _json(v)))
+        return '{' + ', '.join(items) + '}'
+    elif t == type(0) or t == type(0.0):
+        return repr(value)
+    else:
+        return '"' + _escape.sub(_escape_char, str(value)) + '"'
+
+
+def _escape_char(match):
+    """return the JSON escape for one character."""
+
+    c = match.group()
+    if c in '"\\':
+        return '\\' + c
+    return '\\u%04x' % ord(c)
@@ -25,10 +25,18 @@ import os
 import random
 
 import pygame
+from pygame.locals import SRCALPHA
+try:
+    import pygame.mask
+    have_mask = 1
+except ImportError:
+    # pygame before 1.8
+    have_mask = 0
 
 import Sound
 from locals import *
 import conf
+import Trace
 
 
 dirs_cache = {}
@@ -133,6 +141,10 @@ def load_image(filename, convert=1):
         image = image_cache[filename]
 
     else:
+        image = load_atlas_image(filename, convert)
+        if image is not None:
+            return image
+
         dirs = get_dirs('images')
 
         full_path = get_full_path(filename, dirs)
@@ -162,6 +174,10 @@ def load_images(filenames=None, dirname=None, convert=1):
     Uses L{get_dirs} to know where to look for the file or
     directory.
 
+    If an atlas with the same name as C{dirname} has been packed
+    (see L{pack_atlas}) the images are taken from the atlas
+    instead of from the directory.
+
     @param filenames: List of image file names to load data from.
     @param dirname: Name of directory from which to load all images.
     @param convert: Optimize if True. I{Can sometimes cause
@@ -172,6 +188,10 @@ def load_images(filenames=None, dirname=None, convert=1):
     images = []
 
     if dirname is not None:
+        atlas = load_atlas(dirname, convert)
+        if atlas is not None:
+            return atlas.images()
+
         dirs = get_dirs('images')
         for dir in dirs:
             full_dirpath = os.path.join(dir, dirname)
@@ -205,7 +225,8 @@ def load_images_dict(filenames=None, dirname=None, convert=1):
     Must pass either a list of filenames or the name of a directory
     from which to load all images.
 
-    Uses L{get_dirs} to know where to look for the file or directory.
+    Uses L{get_dirs} to know where to look for the file or directory,
+    and prefers a packed atlas of the same name if there is one.
 
     @param filenames: List of image file names to load data from.
     @param dirname: Name of directory from which to load all images.
@@ -217,6 +238,10 @@ def load_images_dict(filenames=None, dirname=None, convert=1):
     images = {}
 
     if dirname is not None:
+        atlas = load_atlas(dirname, convert)
+        if atlas is not None:
+            return atlas.images_dict()
+
         dirs = get_dirs('images')
         for dir in dirs:
             full_dirpath = os.path.join(dir, dirname)
@@ -241,6 +266,325 @@ def load_images_dict(filenames=None, dirname=None, convert=1):
     return images
 
 
+def load_sheet(filename, size, convert=1):
+    """Return list of frames cut from a sprite sheet.
+
+    The sheet is decoded once, and each frame is a subsurface of
+    the sheet, so no pixels are copied. Frames are taken left to
+    right, then top to bottom.
+
+    @param filename: Name of the sheet image file.
+    @param size: C{(width, height)} of each frame.
+    @param convert: Optimize if True.
+
+    """
+
+    sheet = load_image(filename, convert)
+    w, h = size
+    sw, sh = sheet.get_size()
+
+    frames = []
+    for y in range(0, sh - h + 1, h):
+        for x in range(0, sw - w + 1, w):
+            frames.append(sheet.subsurface((x, y, w, h)))
+
+    return frames
+
+
+class Atlas:
+    """Many images packed in to one sheet.
+
+    The sheet is loaded (and converted) only once. Each image is
+    handed out as a subsurface of the sheet, which shares the
+    pixels of the sheet instead of copying them.
+
+    Atlases are made with L{pack_atlas} and loaded with L{load_atlas}.
+
+    """
+
+    def __init__(self, sheet, names, rects):
+        """Initialize the atlas.
+
+        @param sheet: L{pygame.Surface} holding all of the images.
+        @param names: List of image names, in order.
+        @param rects: Dict of C{name: rect} locating each image on
+            the sheet.
+
+        """
+
+        self.sheet = sheet
+        self.names = names
+        self.rects = rects
+        self.frames = {}
+
+    def has_key(self, name):
+        """return True if the atlas holds an image called name."""
+
+        return self.rects.has_key(name)
+
+    def get(self, name):
+        """return the named image, as a subsurface of the sheet."""
+
+        frames = self.frames
+        if not frames.has_key(name):
+            frames[name] = self.sheet.subsurface(self.rects[name])
+        return frames[name]
+
+    def images(self):
+        """return list of all images, in order."""
+
+        return [self.get(name) for name in self.names]
+
+    def images_dict(self):
+        """return dict of C{name: image} for all images."""
+
+        images = {}
+        for name in self.names:
+            images[name] = self.get(name)
+        return images
+
+
+def read_atlas(full_path, convert=1):
+    """Return L{Atlas} from the index file at full_path.
+
+    The index is a text file. Blank lines and lines starting
+    with C{#} are ignored. The first line names the sheet image
+    (in the same directory as the index) and every other line is
+    C{name x y width height} for one image.
+
+    @param full_path: Full path to the C{.atlas} index file.
+    @param convert: Optimize the sheet if True.
+
+    """
+
+    try:
+        f = file(full_path)
+    except IOError:
+        raise pygame.error, 'Could not load %s' % full_path
+
+    sheetname = None
+    names = []
+    rects = {}
+    for line in f.readlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if sheetname is None:
+            sheetname = line
+            continue
+        fields = line.split()
+        name = ' '.join(fields[:-4])
+        x, y, w, h = [int(n) for n in fields[-4:]]
+        names.append(name)
+        rects[name] = pygame.Rect(x, y, w, h)
+    f.close()
+
+    if sheetname is None:
+        raise pygame.error, 'No sheet image named in %s' % full_path
+
+    sheet_path = os.path.join(os.path.dirname(full_path), sheetname)
+    try:
+        sheet = pygame.image.load(sheet_path)
+    except pygame.error:
+        raise pygame.error, 'Could not load %s' % sheet_path
+
+    if convert:
+        try:
+            if does_surface_have_pixel_alpha(sheet):
+                sheet = sheet.convert_alpha()
+            else:
+                sheet = sheet.convert()
+        except pygame.error:
+            # no display mode set yet
+            pass
+
+    return Atlas(sheet, names, rects)
+
+
+atlas_cache = {}
+def load_atlas(name, convert=1):
+    """Return L{Atlas} with the given name, or None if there is none.
+
+    Uses L{get_dirs} to look for the index file C{name.atlas}.
+    Missing atlases are remembered too, so it is cheap to ask
+    again for an atlas which does not exist.
+
+    @param name: Name of the atlas. Usually the name of the
+        directory the images were packed from.
+    @param convert: Optimize the sheet if True.
+
+    """
+
+    global atlas_cache
+
+    if atlas_cache.has_key(name):
+        return atlas_cache[name]
+
+    dirs = get_dirs('images')
+    full_path = get_full_path(name + '.atlas', dirs)
+    if full_path is None:
+        atlas = None
+    else:
+        atlas = read_atlas(full_path, convert)
+
+    atlas_cache[name] = atlas
+    return atlas
+
+
+def load_atlas_image(filename, convert=1):
+    """Return the image for filename from an atlas, or None.
+
+    C{dirname/filename.png} is found as the image C{filename.png}
+    in the atlas called C{dirname}.
+
+    @param filename: Name of image file, including its directory.
+    @param convert: Optimize the sheet if True.
+
+    """
+
+    dirname, name = os.path.split(filename)
+    if not dirname:
+        return None
+
+    atlas = load_atlas(dirname, convert)
+    if atlas is not None and atlas.has_key(name):
+        return atlas.get(name)
+    else:
+        return None
+
+
+def pack_atlas(dirname, name=None, width=1024, padding=1):
+    """Pack all of the images in a directory in to an atlas.
+
+    Writes the sheet image C{name_atlas.png} and the index
+    C{name.atlas} beside the directory. After that, L{load_images},
+    L{load_images_dict} and L{load_image} will use the atlas
+    instead of loading each file separately.
+
+    This is meant to be done once, ahead of time. It does not
+    need a display.
+
+    @param dirname: Directory holding the images. Can be a path, or
+        a name found using L{get_dirs}.
+    @param name: Name of the atlas. Defaults to the directory name.
+    @param width: Maximum width of the sheet in pixels.
+    @param padding: Empty pixels left around each image.
+
+    @return: Full path to the index file.
+
+    """
+
+    if os.path.isdir(dirname):
+        full_dirpath = dirname
+    else:
+        full_dirpath = None
+        for dir in get_dirs('images'):
+            path = os.path.join(dir, dirname)
+            if os.path.isdir(path):
+                full_dirpath = path
+                break
+        if full_dirpath is None:
+            raise pygame.error, 'Could not find %s' % dirname
+
+    full_dirpath = os.path.normpath(os.path.abspath(full_dirpath))
+    parent, base = os.path.split(full_dirpath)
+    if name is None:
+        name = base
+
+    filenames = os.listdir(full_dirpath)
+    filenames.sort()
+    order = []
+    alpha = 0
+    for filename in filenames:
+        full_imagepath = os.path.join(full_dirpath, filename)
+        if not os.path.isfile(full_imagepath):
+            continue
+        try:
+            image = pygame.image.load(full_imagepath)
+        except pygame.error:
+            # must not be an image
+            continue
+        if does_surface_have_pixel_alpha(image):
+            alpha = 1
+        order.append((-image.get_height(), filename, image))
+
+    if not order:
+        raise pygame.error, 'No images found in %s' % full_dirpath
+
+    # Shelf packing: tallest images first, in rows across the sheet
+    order.sort()
+    for negh, filename, image in order:
+        width = max(width, image.get_width() + 2*padding)
+
+    rects = {}
+    x = y = padding
+    shelf_h = 0
+    sheet_w = 0
+    for negh, filename, image in order:
+        w, h = image.get_size()
+        if x + w + padding > width:
+            x = padding
+            y += shelf_h + padding
+            shelf_h = 0
+        rects[filename] = pygame.Rect(x, y, w, h)
+        x += w + padding
+        shelf_h = max(shelf_h, h)
+        sheet_w = max(sheet_w, x)
+    sheet_h = y + shelf_h + padding
+
+    if alpha:
+        sheet = pygame.Surface((sheet_w, sheet_h), SRCALPHA, 32)
+        sheet.fill((0, 0, 0, 0))
+    else:
+        sheet = pygame.Surface((sheet_w, sheet_h), 0, 32)
+        sheet.fill(TRANSPARENT)
+
+    for negh, filename, image in order:
+        # copy the pixels exactly, including any alpha
+        image.set_colorkey(None)
+        image.set_alpha(None)
+        sheet.blit(image, rects[filename])
+
+    sheetname = name + '_atlas.png'
+    pygame.image.save(sheet, os.path.join(parent, sheetname))
+
+    index_path = os.path.join(parent, name + '.atlas')
+    f = file(index_path, 'w')
+    f.write('# pygsear atlas packed from %s\n' % base)
+    f.write('%s\n' % sheetname)
+    for filename in filenames:
+        if rects.has_key(filename):
+            r = rects[filename]
+            f.write('%s %s %s %s %s\n' % (filename, r.x, r.y, r.w, r.h))
+    f.close()
+
+    if atlas_cache.has_key(name):
+        del(atlas_cache[name])
+
+    return index_path
+
+
+def save_image(image, filename, size=None):
+    """Save image to a file.
+
+    @param image: L{pygame.Surface} to save.
+    @param filename: Name of file. The type of file is chosen
+        from the file extension by L{pygame.image.save}.
+    @param size: C{(width, height)} to scale the image to before
+        saving (for making thumbnails), or None to save at full size.
+
+    """
+
+    if size is not None:
+        try:
+            scale = pygame.transform.smoothscale
+        except AttributeError:
+            # pygame before 1.8
+            scale = pygame.transform.scale
+        image = scale(image, size)
+    pygame.image.save(image, filename)
+
+
 sound_cache = {}
 def load_sound(filename):
     """Return pygame sound object.
@@ -283,6 +627,31 @@ def load_sound(filename):
         return sound
 
 
+font_cache = {}
+def load_font(size, filename=None):
+    """Return pygame font object.
+
+    Fonts are cached, so asking for the same font again does not
+    open the font file again.
+
+    @param size: Font size.
+    @param filename: Name of font file, or None for the pygame
+        default font.
+
+    """
+
+    global font_cache
+
+    key = (filename, size)
+    if font_cache.has_key(key):
+        return font_cache[key]
+
+    else:
+        font = pygame.font.Font(filename, size)
+        font_cache[key] = font
+        return font
+
+
 def beep():
     print chr(7)
 
@@ -327,6 +696,46 @@ def load_points(filename):
         return points
 
 
+map_cache = {}
+def load_map(filename):
+    """Return list of rows of tile numbers.
+
+    @param filename: Name of file to load data from.
+        Data should be one row of the map per line, with the
+        tile numbers separated by spaces or commas.
+
+    """
+
+    global map_cache
+
+    if map_cache.has_key(filename):
+        rows = map_cache[filename]
+        return rows
+
+    else:
+        dirs = get_dirs('maps')
+
+        full_path = get_full_path(filename, dirs)
+        try:
+            f = file(full_path)
+        except (IOError, TypeError):
+            f = None
+
+        if f is None:
+            raise pygame.error, 'Could not load %s' % filename
+
+        rows = []
+        for line in f.readlines():
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            rows.append([int(n) for n in line.replace(',', ' ').split()])
+        f.close()
+
+        map_cache[filename] = rows
+        return rows
+
+
 # LINE INTERSECTION CODE IS
 # ADAPTED FROM PYGAME PCR
 DONT_INTERSECT = 0
@@ -406,6 +815,104 @@ def line_seg_intersect(line1point1, line1point2, line2point1, line2point2):
     return (x, y)
 
 
+def rect_separation(rect, other):
+    """return the shortest move which takes rect off of other.
+
+    @param rect: L{pygame.Rect} to be moved.
+    @param other: L{pygame.Rect} it overlaps.
+
+    @return: C{(dx, dy)}, with one of them 0, or C{(0, 0)} if the
+        rects do not overlap.
+
+    """
+
+    if not rect.colliderect(other):
+        return (0, 0)
+
+    to_right = other.right - rect.left
+    to_left = rect.right - other.left
+    if to_right < to_left:
+        dx = to_right
+    else:
+        dx = -to_left
+
+    to_bottom = other.bottom - rect.top
+    to_top = rect.bottom - other.top
+    if to_bottom < to_top:
+        dy = to_bottom
+    else:
+        dy = -to_top
+
+    if abs(dx) < abs(dy):
+        return (dx, 0)
+    else:
+        return (0, dy)
+
+
+def rect_sweep(rect, dx, dy, other):
+    """Find when a moving rect first touches a still one.
+
+    @param rect: L{pygame.Rect} at its starting position.
+    @param dx: Distance rect moves in the x-direction.
+    @param dy: Distance rect moves in the y-direction.
+    @param other: L{pygame.Rect} which does not move.
+
+    @return: C{(t, normal)} where C{t} is the fraction (0 to 1) of the
+        move done when the rects first touch, and C{normal} is the
+        C{(nx, ny)} direction of the face of other which was hit.
+        Returns None if they do not touch during the move. If the
+        rects overlap already, returns C{(0, (0, 0))}.
+
+    """
+
+    if rect.colliderect(other):
+        return (0, (0, 0))
+
+    far = 1e300
+
+    if dx > 0:
+        tx_entry = (other.left - rect.right) / float(dx)
+        tx_exit = (other.right - rect.left) / float(dx)
+    elif dx < 0:
+        tx_entry = (other.right - rect.left) / float(dx)
+        tx_exit = (other.left - rect.right) / float(dx)
+    elif rect.right <= other.left or rect.left >= other.right:
+        return None
+    else:
+        tx_entry = -far
+        tx_exit = far
+
+    if dy > 0:
+        ty_entry = (other.top - rect.bottom) / float(dy)
+        ty_exit = (other.bottom - rect.top) / float(dy)
+    elif dy < 0:
+        ty_entry = (other.bottom - rect.top) / float(dy)
+        ty_exit = (other.top - rect.bottom) / float(dy)
+    elif rect.bottom <= other.top or rect.top >= other.bottom:
+        return None
+    else:
+        ty_entry = -far
+        ty_exit = far
+
+    entry = max(tx_entry, ty_entry)
+    exit = min(tx_exit, ty_exit)
+    if entry >= exit or entry < 0 or entry >= 1:
+        return None
+
+    if tx_entry > ty_entry:
+        if dx > 0:
+            normal = (-1, 0)
+        else:
+            normal = (1, 0)
+    else:
+        if dy > 0:
+            normal = (0, -1)
+        else:
+            normal = (0, 1)
+
+    return (entry, normal)
+
+
 def scale_image(img, width, height, keepAspectRatio=1):
     """return a scaled copy of a L{pygame.Surface}
 
@@ -462,6 +969,37 @@ def does_surface_have_pixel_alpha(surface):
     return surface.get_masks()[3] != 0
 
 
+mask_cache = {}
+mask_cache_size = 2000
+def get_mask(image):
+    """return the collision mask for image.
+
+    The mask is made from the image's colorkey or alpha the first
+    time it is asked for, and kept for the next time. Masks are
+    only available with pygame 1.8 or later (see C{have_mask}).
+
+    @param image: L{pygame.Surface} to get the mask for.
+
+    @return: L{pygame.mask.Mask}
+
+    """
+
+    global mask_cache
+
+    key = id(image)
+    if mask_cache.has_key(key):
+        original, mask = mask_cache[key]
+        if original is image:
+            return mask
+
+    if len(mask_cache) >= mask_cache_size:
+        mask_cache.clear()
+
+    mask = pygame.mask.from_surface(image)
+    mask_cache[key] = (image, mask)
+    return mask
+
+
 # WORD WRAPPED TEXT CODE IS
 # ADAPTED FROM PYGAME PCR
 class TextRectException(Exception):
@@ -608,14 +1146,18 @@ def color(name, modifier=None):
     return tuple(acolor)
 
 
+# record file loading in traces (see Trace)
+load_image = Trace.traced(load_image, 'load')
+load_images = Trace.traced(load_images, 'load')
+load_images_dict = Trace.traced(load_images_dict, 'load')
+load_sheet = Trace.traced(load_sheet, 'load')
+load_atlas = Trace.traced(load_atlas, 'load')
+load_sound = Trace.traced(load_sound, 'load')
+load_points = Trace.traced(load_points, 'load')
+load_map = Trace.traced(load_map, 'load')
 
 
-
-
-
-
-
-
-
-
-
+if __name__ == '__main__':
+    # pack each directory named on the command line
+    for dirname in sys.argv[1:]:
+        print pack_atlas(dirname)
@@ -27,7 +27,12 @@ from code import compile_command
 
 import pygame
 import pygame.draw
-from pygame.locals import K_RETURN, K_ESCAPE, K_BACKSPACE, K_F1, K_UP, K_DOWN
+try:
+    import numpy
+    import pygame.surfarray
+except ImportError:
+    numpy = None
+from pygame.locals import K_RETURN, K_ESCAPE, K_BACKSPACE, K_F1, K_F3, K_UP, K_DOWN
 from pygame.locals import K_PAGEUP, K_PAGEDOWN, K_LEFT, K_RIGHT, K_DELETE
 from pygame.locals import QUIT, MOUSEBUTTONUP
 
@@ -37,6 +42,7 @@ from Drawable import Rectangle
 import Path
 import Event
 import Util
+import Trace
 from locals import TRANSPARENT, BLACK, WHITE, LGREEN, LGRAY, GRAY, BLUE, RED
 
 
@@ -70,7 +76,11 @@ class Widget:
     def modal(self):
         stop = Event.KEYUP_Event(key=K_ESCAPE, callback=self._stop)
         while not self.stop:
+            start = Trace.begin()
             self.events.check()
+            Trace.end(self.__class__.__name__ + '.modal', 'widget', start)
+            if conf.IDLE_WAIT and not self.stop:
+                self.events.wait()
 
 
 class Score(Widget, Drawable.Drawable):
@@ -125,6 +135,192 @@ class Score(Widget, Drawable.Drawable):
             self.image.set_colorkey(TRANSPARENT)
 
 
+class PerfHUD(Widget, Drawable.Drawable):
+    """Overlay showing how fast the game is running.
+
+    Shows the frames per second, a graph of recent frame times, the
+    number of dirty rects, sprites at each level of the game's
+    L{Drawable.SpriteGroup}, events and timers, and the sizes of the
+    caches.
+
+    Frame times are collected every frame, but the text and graph are
+    only drawn again a few times each second, so showing the overlay
+    does not slow down the game much.
+
+    Press the key (F3 by default) to show or hide the overlay.
+
+    """
+
+    def __init__(self, game=None, key=K_F3, position=(5, 5), rate=4,
+                    history=100, fontSize=16, color=LGREEN, bgcolor=BLACK,
+                    level=1000):
+        """Initialize the overlay.
+
+        @param game: L{Game.Game} to watch. Default is C{conf.game}.
+        @param key: Key which shows and hides the overlay.
+        @param position: Where to put the top left corner.
+        @param rate: Number of times each second to update the text.
+        @param history: Number of frames shown in the graph.
+        @param fontSize: Size of the text.
+        @param color: Color of the text and graph.
+        @param bgcolor: Color behind the text and graph.
+        @param level: Drawing level in the game's sprite group.
+
+        """
+
+        if game is None:
+            game = conf.game
+        self.game = game
+        Widget.__init__(self)
+        Drawable.Drawable.__init__(self, game.window)
+
+        self.hud_position = position
+        self.interval = 1000 / rate
+        self.history = history
+        self.color = color
+        self.bgcolor = bgcolor
+        self.level = level
+        self.font = pygame.font.Font(None, fontSize)
+        self.line_height = self.font.get_linesize()
+
+        self.frame_times = []
+        self.since_update = self.interval
+        self.caches = []
+        self.add_cache('image', Util.image_cache)
+        self.add_cache('sound', Util.sound_cache)
+        self.add_cache('mask', Util.mask_cache)
+        self.add_cache('font', Util.font_cache)
+
+        self.image = pygame.Surface((1, 1))
+        self.shown = 0
+        self.toggle_event = Event.KEYUP_Event(key=key, callback=self.toggle)
+        game.events.add(self.toggle_event)
+
+    def add_cache(self, name, cache):
+        """Show the size of another cache.
+
+        @param name: Name to show.
+        @param cache: Dictionary (or anything with a length).
+
+        """
+
+        self.caches.append((name, cache))
+
+    def toggle(self, pygame_event=None):
+        """Show the overlay if it is hidden, or hide it if it is shown."""
+
+        if self.shown:
+            self.hide()
+        else:
+            self.show()
+
+    def show(self):
+        """Put the overlay on top of the game's sprites."""
+
+        self.shown = 1
+        self.frame_times = []
+        self.since_update = self.interval
+        self.refresh()
+        self.game.sprites.add(self, level=self.level)
+
+    def hide(self):
+        """Take the overlay off the screen."""
+
+        self.shown = 0
+        self.kill()
+
+    def move(self):
+        """Note the time since the last frame, and redraw the
+        overlay if it is time to.
+
+        """
+
+        ticks = conf.ticks
+        times = self.frame_times
+        times.append(ticks)
+        if len(times) > self.history:
+            del times[0]
+
+        self.since_update += ticks
+        if self.since_update >= self.interval:
+            self.refresh()
+
+    def get_lines(self):
+        """return the lines of text to show."""
+
+        game = self.game
+        times = self.frame_times
+        if times:
+            average = float(sum(times)) / len(times)
+            longest = max(times)
+        else:
+            average = longest = 0
+        if average:
+            average_fps = 1000 / average
+        else:
+            average_fps = 0
+
+        levels = game.sprites.levels
+        keys = levels.keys()
+        keys.sort()
+        total = 0
+        counts = []
+        for key in keys:
+            n = len(levels[key].sprites())
+            total += n
+            counts.append('%s:%d' % (key, n))
+
+        caches = []
+        for name, cache in self.caches:
+            caches.append('%s %d' % (name, len(cache)))
+
+        return ['FPS %.1f  avg %.1f' % (game.clock.get_fps(), average_fps),
+                'frame %.1f ms  max %d ms' % (average, longest),
+                'dirty rects %d' % getattr(game, 'dirty_count', 0),
+                'sprites %d  (%s)' % (total, ' '.join(counts)),
+                'events %d  timers %d' % (len(game.events.events()),
+                                    len(game.events.TIMEOUT_Events.sprites())),
+                'cache ' + '  '.join(caches)]
+
+    def refresh(self):
+        """Draw the text and graph again."""
+
+        self.since_update = 0
+
+        lines = []
+        width = self.history
+        for line in self.get_lines():
+            text = self.font.render(line, 1, self.color, self.bgcolor)
+            lines.append(text)
+            width = max(width, text.get_width())
+
+        graph_height = 40
+        height = self.line_height * len(lines) + graph_height + 4
+        image = pygame.Surface((width + 4, height)).convert()
+        image.fill(self.bgcolor)
+        y = 2
+        for text in lines:
+            image.blit(text, (2, y))
+            y += self.line_height
+
+        # frame times, with a line at 1/MAX_FPS
+        bottom = height - 2
+        scale = graph_height / 100.0
+        target = bottom - int(1000 / conf.MAX_FPS * scale)
+        pygame.draw.line(image, GRAY, (2, target), (width + 1, target))
+        times = self.frame_times
+        if len(times) > 1:
+            points = []
+            for x in range(len(times)):
+                points.append((2 + x, bottom - int(min(times[x], 100) * scale)))
+            pygame.draw.lines(image, self.color, 0, points)
+
+        self.image = image
+        self.rect = image.get_rect()
+        self.set_crect(self.rect)
+        self.set_position(self.hud_position)
+
+
 class ProgressBar(Widget, Rectangle):
     """Percentage bar graph."""
 
@@ -337,9 +533,13 @@ class SpriteButton(Button, Drawable.Drawable):
         self.events.add(stop)
 
         while not self.stop:
+            start = Trace.begin()
             self.clear()
             self.events.check()
             self.udraw()
+            Trace.end(self.__class__.__name__ + '.modal', 'widget', start)
+            if conf.IDLE_WAIT and not self.stop:
+                self.events.wait()
         quit.kill()
         stop.kill()
         self.uclear()
@@ -386,7 +586,16 @@ class CloseButton(StationaryButton):
 
 
 class TextButton:
-    """Clickable button with text printed on it."""
+    """Clickable button with text printed on it.
+
+    The finished button images are kept in C{button_cache}, keyed by
+    everything that changes how the button looks (see L{get_state}),
+    so switching back to a state the button was in before (like
+    active and inactive colors) does not render the text again.
+
+    """
+
+    button_cache_size = 8
 
     def __init__(self,
                     window=None,
@@ -409,60 +618,94 @@ class TextButton:
         self.borderColor = borderColor
         self.padding = padding
         self.bgColor = bgColor
+        self.button_cache = {}
         self.makeButton()
 
+    def get_state(self):
+        """return a key for everything that changes how the button looks."""
+
+        if hasattr(self, 'cursor_pos'):
+            cursor = self.cursor_pos
+        else:
+            cursor = None
+        return (self.text, cursor, self.length, self.size, tuple(self.color),
+                    self.border, tuple(self.borderColor), self.padding,
+                    tuple(self.bgColor))
+
     def makeButton(self):
-        window = self.window
+        """Set C{box.image} to the button image, rendering it only if
+        the button has not looked this way before.
+
+        """
+
+        cache = self.button_cache
+        state = self.get_state()
+        image = cache.get(state)
+        if image is None:
+            image = self.renderButton()
+            if len(cache) >= self.button_cache_size:
+                cache.clear()
+            cache[state] = image
+
+        if hasattr(self, 'box') and self.box.image.get_size() == image.get_size():
+            self.box.image = image
+        else:
+            w, h = image.get_size()
+            box = Drawable.Rectangle(w=self.window, width=w, height=h)
+            box.image = image
+            self.box = box
+
+    def renderText(self, text, color, bgColor):
+        """return a surface with text rendered in the button font."""
+
+        font = Util.load_font(self.size)
+        if text:
+            return font.render(text, 1, color, bgColor)
+        else:
+            return pygame.Surface((0, font.get_height()))
+
+    def renderButton(self):
+        """return a new surface with the button drawn on it."""
+
         text = self.text
         length = self.length
-        size = self.size
         color = self.color
         border = self.border
         borderColor = self.borderColor
         padding = self.padding
         bgColor = self.bgColor
 
-        t = Drawable.String(message=text, fontSize=size, color=color,
-                                    bgcolor=bgColor)
+        t = self.renderText(text, color, bgColor)
 
         # use inverse text at cursor position if cursor_pos is set
         if hasattr(self, 'cursor_pos'):
             c = self.cursor_pos
-            before = Drawable.String(message=text[:c], fontSize=size, color=color,
-                                    bgcolor=bgColor)
-            bw, bh = before.image.get_size()
-            cursor = Drawable.String(message=text[c:c+1], fontSize=size, color=bgColor,
-                                    bgcolor=color)
-            cw, ch = cursor.image.get_size()
-            t.image.blit(cursor.image, (bw, 0))
-
-        w, h = t.image.get_size()
+            bw = Util.load_font(self.size).size(text[:c])[0]
+            cursor = self.renderText(text[c:c+1], bgColor, color)
+            t.blit(cursor, (bw, 0))
+
+        w, h = t.get_size()
         if length is not None:
-            s = pygame.Surface((length, h))
-            s.fill(bgColor)
-            s.blit(t.image, (0, 0))
             w = length
         self.length = w
 
         bw = w + 2*padding + 2*border
         bh = h + 2*padding + 2*border
 
+        image = pygame.Surface((bw, bh)).convert()
         if border:
-            #print 'boxing', dir(window)
-            box = Drawable.Rectangle(w=window, width=bw, height=bh,
-                                        color=borderColor)
+            image.fill(borderColor)
             iw = w + 2*padding
             ih = h + 2*padding
-            pygame.draw.rect(box.image, bgColor,
+            pygame.draw.rect(image, bgColor,
                                 ((border, border), (iw, ih)))
         else:
-            #print 'boxing', dir(window)
-            box = Drawable.Rectangle(w=window, width=bw, height=bh, color=bgColor)
-        box.image.blit(t.image, (border+padding, border+padding))
+            image.fill(bgColor)
+        image.blit(t, (border+padding, border+padding), ((0, 0), (w, h)))
         if bgColor == TRANSPARENT:
-            box.image.set_colorkey(TRANSPARENT)
+            image.set_colorkey(TRANSPARENT)
 
-        self.box = box
+        return image
 
 
 class SpriteTextButton(TextButton, SpriteButton):
@@ -509,7 +752,13 @@ class StationaryTextButton(TextButton, StationaryButton):
 
 
 class TextInput(SpriteTextButton):
-    """Used to gather text input from the user."""
+    """Used to gather text input from the user.
+
+    While typing, only the characters which changed (and the cursor)
+    are rendered again. The rest of the line is copied from what was
+    already on the button.
+
+    """
 
     def __init__(self,
                     window=None,
@@ -554,6 +803,7 @@ class TextInput(SpriteTextButton):
         self.text_content = text
         t = prompt + text + " " * (maxLength - len(text))
         self.active = 0
+        self.rendered = None
         SpriteTextButton.__init__(self, window, t, length, callback, size, color,
                                 border, borderColor, padding, bgColor, group)
 
@@ -709,16 +959,78 @@ class TextInput(SpriteTextButton):
         self.udraw()
 
     def makeButton(self):
-        if self.prompt:
-            if hasattr(self, 'cursor_pos'):
+        if hasattr(self, 'cursor_pos'):
+            cursor = self.cursor_pos + len(self.prompt)
+        else:
+            cursor = None
+        colors = (tuple(self.color), tuple(self.bgColor))
+
+        rendered = self.rendered
+        if rendered is not None and rendered[2] == colors:
+            self.updateText(self.text, cursor)
+        else:
+            if self.prompt and cursor is not None:
                 promptlen = len(self.prompt)
                 self.cursor_pos += promptlen
                 TextButton.makeButton(self)
                 self.cursor_pos -= promptlen
             else:
                 TextButton.makeButton(self)
-        else:
-            TextButton.makeButton(self)
+            # updateText draws on the image, so do not share
+            # it with the button_cache
+            self.box.image = self.box.image.copy()
+        self.rendered = (self.text, cursor, colors)
+
+    def updateText(self, text, cursor):
+        """Draw the changes since the last time the text was rendered.
+
+        Everything from the start of the first changed word has to
+        be drawn again (since it may have moved over) but only up to
+        the end of the text. The padding after that is just filled in.
+
+        @param text: Full text (including prompt and padding) to show.
+        @param cursor: Index in text of the cursor, or None.
+
+        """
+
+        old, old_cursor, colors = self.rendered
+
+        n = min(len(old), len(text))
+        lo = 0
+        while lo < n and old[lo] == text[lo]:
+            lo += 1
+        if lo == len(old) == len(text) and old_cursor == cursor:
+            return
+        for c in (old_cursor, cursor):
+            if c is not None:
+                lo = min(lo, c)
+        # letters in the middle of a word may not line up exactly
+        # with where they were rendered as part of the whole word
+        lo = text.rfind(' ', 0, lo) + 1
+
+        hi = max(len(text.rstrip()), lo + 1)
+        if cursor is not None:
+            hi = max(hi, cursor + 1)
+        hi = min(hi, len(text))
+
+        color = self.color
+        bgColor = self.bgColor
+        font = Util.load_font(self.size)
+        x0 = font.size(text[:lo])[0]
+
+        inset = self.border + self.padding
+        w = self.length
+        h = font.get_height()
+        if x0 >= w:
+            return
+        line = self.box.image.subsurface(((inset, inset), (w, h)))
+        line.fill(bgColor, ((x0, 0), (w - x0, h)))
+
+        span = self.renderText(text[lo:hi], color, bgColor)
+        if cursor is not None and lo <= cursor < hi:
+            cx = font.size(text[:cursor])[0] - x0
+            span.blit(self.renderText(text[cursor:cursor+1], bgColor, color), (cx, 0))
+        line.blit(span, (x0, 0))
 
     def activate(self):
         Widget.activate(self)
@@ -760,18 +1072,30 @@ class TextInput(SpriteTextButton):
 
         self.stop = 0
         self.activate()
+        waited = 0
         while not self.stop and self.active:
-            try:
-                conf.ticks = min(20, conf.game.clock.tick(conf.MAX_FPS))
-            except AttributeError:
-                conf.ticks = 20
+            if waited:
+                # conf.ticks was set by the wait
+                waited = 0
+            else:
+                try:
+                    conf.ticks = min(20, conf.game.clock.tick(conf.MAX_FPS))
+                except AttributeError:
+                    conf.ticks = 20
+            start = Trace.begin()
             self.clear()
             self.events.check()
             self.udraw()
 
+            Trace.end(self.__class__.__name__ + '.modal', 'widget', start)
+
             if not self.line.repeater.key_held and not self.stop:
-                ev = pygame.event.wait()
-                pygame.event.post(ev)
+                if conf.IDLE_WAIT:
+                    self.events.wait()
+                    waited = 1
+                else:
+                    ev = pygame.event.wait()
+                    pygame.event.post(ev)
 
         self.deactivate()
         quit.kill()
@@ -813,9 +1137,13 @@ class Dialog(Drawable.Layer, Widget):
 
         self.stop = 0
         while not self.stop:
+            start = Trace.begin()
             self.clear()
             self.events.check()
             self.udraw()
+            Trace.end(self.__class__.__name__ + '.modal', 'widget', start)
+            if conf.IDLE_WAIT and not self.stop:
+                self.events.wait()
         quit_ev.kill()
         stop_ev.kill()
         self.uclear()
@@ -945,19 +1273,31 @@ class Dialog_LineInput(Dialog_OK):
         self.line.activate()
 
         self.stop = 0
+        waited = 0
         while not self.stop:
-            try:
-                conf.ticks = min(20, conf.game.clock.tick(conf.MAX_FPS))
-            except AttributeError:
-                conf.ticks = 20
+            if waited:
+                # conf.ticks was set by the wait
+                waited = 0
+            else:
+                try:
+                    conf.ticks = min(20, conf.game.clock.tick(conf.MAX_FPS))
+                except AttributeError:
+                    conf.ticks = 20
+            start = Trace.begin()
             self.clear()
             self.events.check()
             self.line.udraw()
             self.udraw()
 
+            Trace.end(self.__class__.__name__ + '.modal', 'widget', start)
+
             if not self.line.repeater.key_held and not self.stop:
-                ev = pygame.event.wait()
-                pygame.event.post(ev)
+                if conf.IDLE_WAIT:
+                    self.events.wait()
+                    waited = 1
+                else:
+                    ev = pygame.event.wait()
+                    pygame.event.post(ev)
 
         quit_ev.kill()
         stop_ev.kill()
@@ -968,7 +1308,17 @@ class Dialog_LineInput(Dialog_OK):
 
 
 class Dialog_ColorSelector(Dialog_OK):
-    """Used to choose a color interactively"""
+    """Used to choose a color interactively
+
+    Color squares already painted are kept in C{square_cache} (shared
+    by all color selectors) so moving back and forth along the hue bar
+    does not paint them again.
+
+    """
+
+    square_cache = {}
+    square_cache_size = 60
+    hue_strip = None
 
     def __init__(self, window=None):
         """Initialize the color selector"""
@@ -977,8 +1327,6 @@ class Dialog_ColorSelector(Dialog_OK):
 
         self.color_square = Drawable.Square(w=self, side=256)
         self.color_square.set_position((10, 10))
-        self.color_square_array = pygame.surfarray.array2d(self.color_square.image)
-        #self.R = 0
         self.hue = 0
         self.set_color_square()
 
@@ -1000,14 +1348,35 @@ class Dialog_ColorSelector(Dialog_OK):
         color, then ranges over all possible saturations and values to make
         a square.
 
-        This is way too slow.
-
         """
 
         image = self.color_square.image
 
-        h = self.hue
-        r, g, b = colorsys.hsv_to_rgb(h, 1, 1)
+        # the hue bar only has 360 different hues
+        key = int(round(self.hue * 360)) % 360
+        cache = self.square_cache
+        square = cache.get(key)
+        if square is None:
+            if len(cache) >= self.square_cache_size:
+                cache.clear()
+            r, g, b = colorsys.hsv_to_rgb(key / 360.0, 1, 1)
+            # surfarray can not fill in 8 bit (palette) surfaces
+            if numpy is not None and image.get_bitsize() > 8:
+                self._paint_square_numpy(image, r, g, b)
+            else:
+                self._paint_square(image, r, g, b)
+            cache[key] = image.copy()
+        else:
+            image.blit(square, (0, 0))
+
+        self.color_square.udraw()
+
+    def _paint_square(self, image, r, g, b):
+        """Paint the color square one pixel at a time.
+
+        Only used if numpy is not available, or on an 8 bit display.
+
+        """
 
         rmax = r * 255
         gmax = g * 255
@@ -1034,44 +1403,45 @@ class Dialog_ColorSelector(Dialog_OK):
             gmax += dg
             bmax += db
 
-        self.color_square.udraw()
+    def _paint_square_numpy(self, image, r, g, b):
+        """Paint the color square all at once with numpy.
 
+        Each row goes from black on the left to a color on the right,
+        and the colors go from the pure hue at the top to white at the
+        bottom.
 
-        #         image = self.color_square.image
-        #
-        #         h = self.hue
-        #         r, g, b = colorsys.hsv_to_rgb(h, 1, 1)
-        #
-        #         x,y = N.indices((256,256), N.Float)
-        #         y /= 256.0
-        #         row_mul = 1-y
-        #
-        #         y *= x
-        #         x *= row_mul
-        #
-        #         rgb = N.zeros((256,256,3), N.Float)
-        #         rgb[...,0] = x * r + y
-        #         rgb[...,1] = x * g + y
-        #         rgb[...,2] = x * b + y
-        #
-        #         a = pygame.surfarray.pixels3d(image)
-        #         a[...] = rgb.astype(N.UnsignedInt8)
-        #
-        #         self.color_square.udraw()
+        """
 
+        fraction = numpy.arange(256) / 255.0
+        rgb = numpy.empty((256, 256, 3), numpy.float64)
+        for c, top in enumerate((r, g, b)):
+            top = top * 255
+            right = top + (255 - top) * fraction
+            rgb[..., c] = numpy.outer(fraction, right)
+        pygame.surfarray.blit_array(image, rgb.astype(numpy.uint8))
 
     def set_color_rect(self):
-        """Set up the chooser for the red value of the color."""
+        """Set up the chooser for the hue of the color."""
 
         image = self.color_rect.image
-        #         for R in range(256):
-        #             pygame.draw.line(image, (R, 0, 0), (0, R), (19, R))
-        for hue in range(360):
-            h = hue / 360.0
-            s = v = 1.0
-            r, g, b = colorsys.hsv_to_rgb(h, s, v)
-            R, G, B = 255 * r, 255* g, 255 * b
-            pygame.draw.line(image, (R, G, B), (0, hue), (19, hue))
+        strip = self.hue_strip
+        if strip is None:
+            strip = image.copy()
+            if numpy is not None and strip.get_bitsize() > 8:
+                rgb = numpy.empty((20, 360, 3), numpy.float64)
+                for hue in range(360):
+                    rgb[:, hue] = colorsys.hsv_to_rgb(hue / 360.0, 1, 1)
+                rgb *= 255
+                pygame.surfarray.blit_array(strip, rgb.astype(numpy.uint8))
+            else:
+                for hue in range(360):
+                    h = hue / 360.0
+                    s = v = 1.0
+                    r, g, b = colorsys.hsv_to_rgb(h, s, v)
+                    R, G, B = 255 * r, 255* g, 255 * b
+                    pygame.draw.line(strip, (R, G, B), (0, hue), (19, hue))
+            Dialog_ColorSelector.hue_strip = strip
+        image.blit(strip, (0, 0))
         self.color_rect.udraw()
 
     def set_color_chosen(self, color):
@@ -1145,11 +1515,15 @@ class Dialog_ColorSelector(Dialog_OK):
 
         self.stop = 0
         while not self.stop:
+            start = Trace.begin()
             self.clear()
             self.events.check()
             if self.button_pressed:
                 self.mousebutton_action()
             self.udraw()
+            Trace.end(self.__class__.__name__ + '.modal', 'widget', start)
+            if conf.IDLE_WAIT and not self.stop and not self.button_pressed:
+                self.events.wait()
         quit_ev.kill()
         stop_ev.kill()
         self.uclear()
@@ -1219,7 +1593,20 @@ class Console(Widget):
         self.line.deactivate()
         self.layer.uclear()
 
-    def new_line(self, text, prompt=''):
+    def new_line(self, text, prompt='', batch=None):
+        """Add a line of text to the console.
+
+        @param text: Line to add.
+        @param prompt: Prompt to show in front of the text.
+        @param batch: L{Drawable.StationaryBatch} to collect the
+            updates. If given, the lines are not scrolled, and it is up
+            to the caller to scroll by the returned height and commit
+            the batch.
+
+        @return: Height of the new line.
+
+        """
+
         save_text = prompt + text
         s = Drawable.String(w=self.lines, message=save_text, fontSize=22)
         w, h = s.get_size()
@@ -1241,11 +1628,14 @@ class Console(Widget):
             # bother trying to extend it if it starts to get full.
             Util.beep()
 
-        s = Drawable.Stationary(w=self.lines, sprite=s)
+        s = Drawable.Stationary(w=self.lines, sprite=s, batch=batch)
         s.draw()
-        self.lines.clear()
-        self.lines.nudge(dy=-h)
-        self.lines.udraw()
+        if batch is None:
+            self.lines.clear()
+            self.lines.nudge(dy=-h)
+            self.lines.udraw()
+
+        return h
 
     def write(self, text):
         self.handle_print(text)
@@ -1253,8 +1643,14 @@ class Console(Widget):
     def handle_print(self, text):
         text = text.strip()
         lines = str(text).split('\n')
+        batch = Drawable.StationaryBatch(self.lines)
+        h = 0
         for line in lines:
-            self.new_line(line, prompt='')
+            h += self.new_line(line, prompt='', batch=batch)
+        batch.commit()
+        self.lines.clear()
+        self.lines.nudge(dy=-h)
+        self.lines.udraw()
 
     def handle_pageup(self, pygame_event=None):
         self.paged_up += self.lines_per_screen
@@ -1375,20 +1771,32 @@ class Console(Widget):
         self.line.udraw()
 
         self.stop = 0
+        waited = 0
         while not self.stop:
-            try:
-                conf.ticks = min(20, conf.game.clock.tick(conf.MAX_FPS))
-            except AttributeError:
-                conf.ticks = 20
+            if waited:
+                # conf.ticks was set by the wait
+                waited = 0
+            else:
+                try:
+                    conf.ticks = min(20, conf.game.clock.tick(conf.MAX_FPS))
+                except AttributeError:
+                    conf.ticks = 20
+            start = Trace.begin()
             self.layer.clear()
             self.events.check()
             if self.active:
                 self.line.udraw()
                 self.layer.udraw()
 
+            Trace.end(self.__class__.__name__ + '.modal', 'widget', start)
+
             if not self.line.repeater.key_held and not self.stop:
-                ev = pygame.event.wait()
-                pygame.event.post(ev)
+                if conf.IDLE_WAIT:
+                    self.events.wait()
+                    waited = 1
+                else:
+                    ev = pygame.event.wait()
+                    pygame.event.post(ev)
 
         self.quit_ev.kill()
         self.stop_ev.kill()
@@ -52,6 +52,9 @@ WINSIZE = [WINWIDTH, WINHEIGHT]
 MAX_FPS = 30
 MAX_TICK = 50
 
+# sleep in modal loops until an event or timer is due
+IDLE_WAIT = 1
+
 ticks = 0
 
 sound_status = None